@@ -0,0 +1,102 @@
+"""Measure how many concurrent connections a running server keeps serving.
+
+Opens the given number of connections that each request a path in a loop,
+keeping them alive when the server allows it, and reports completed requests,
+failed requests and latency percentiles. Run it
+against the WSGI server and the ASGI app with the same database, e.g.
+
+    gunicorn "scoreboard:create_app()" --bind 127.0.0.1:8000
+    uvicorn --factory scoreboard.asgi:create_asgi_app --port 8001
+
+    python benchmarks/concurrent_connections.py http://127.0.0.1:8000/scores -c 300
+    python benchmarks/concurrent_connections.py http://127.0.0.1:8001/scores -c 300
+
+Only the standard library is used, so it runs without installing anything.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def client(host, port, target, deadline, timeout, latencies, errors):
+    """Request target until the deadline, reconnecting when the server closes."""
+    request = (
+        f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n"
+    ).encode()
+    reader = writer = None
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, port), timeout
+                )
+            writer.write(request)
+            await writer.drain()
+            keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+            latencies.append(time.monotonic() - start)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as ex:
+            errors.append(type(ex).__name__)
+            keep_alive = False
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def read_response(reader: asyncio.StreamReader) -> bool:
+    """Read one response and return whether the connection is kept alive."""
+    headers = await reader.readuntil(b"\r\n\r\n")
+    length = 0
+    keep_alive = True
+    for line in headers.split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"connection" and value.strip().lower() == b"close":
+            keep_alive = False
+    await reader.readexactly(length)
+    return keep_alive
+
+
+def percentile(values, fraction):
+    if len(values) < 2:
+        return values[0] if values else float("nan")
+    return statistics.quantiles(values, n=100, method="inclusive")[int(fraction * 100) - 1]
+
+
+async def main(url, concurrency, duration, timeout):
+    parts = urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(
+        *(
+            client(parts.hostname, parts.port or 80, target, deadline, timeout, latencies, errors)
+            for _ in range(concurrency)
+        )
+    )
+    print(f"connections: {concurrency}, duration: {duration}s")
+    print(f"requests: {len(latencies)} ({len(latencies) / duration:.1f}/s)")
+    print(f"failed requests: {len(errors)} {sorted(set(errors))}")
+    print(
+        "latency ms p50/p95/p99: "
+        + "/".join(
+            f"{percentile(latencies, p) * 1000:.1f}" for p in (0.5, 0.95, 0.99)
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("url")
+    parser.add_argument("-c", "--concurrency", type=int, default=100)
+    parser.add_argument("-d", "--duration", type=float, default=10)
+    parser.add_argument("-t", "--timeout", type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.concurrency, args.duration, args.timeout))
@@ -0,0 +1,456 @@
+"""Run a realistic traffic mix against the whole app and report latencies.
+
+Virtual users log in and then repeatedly pick an action by weight from the
+scenario, e.g. polling the leaderboard, opening a user's score history,
+giving a score or editing a user as an admin, with a random think time in
+between. Every virtual user logs in again at each login burst, like when a
+room full of people opens the page at once.
+
+Test data (recipients, scores and the virtual users' accounts) is added to
+the database before the run if it is not already there. By default the app
+is driven in-process through create_app() with one thread per virtual user,
+which also measures how long write statements waited for the SQLite write
+lock. With --url a running server on the same database is driven over HTTP
+instead, e.g. a local gunicorn:
+
+    export SQLALCHEMY_DATABASE_URI=sqlite:////tmp/loadtest.db
+    python benchmarks/load_test.py -u 50 -d 30
+    gunicorn -c gunicorn.conf.py "scoreboard:create_app()" &
+    python benchmarks/load_test.py -u 50 -d 30 --url http://127.0.0.1:8000
+
+The scenario can be changed with --scenario, a JSON file with any of the keys
+in DEFAULT_SCENARIO. --output writes the report as JSON, to compare releases.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_SCENARIO = {
+    # Relative weights of the actions below.
+    "actions": {
+        "poll_scores": 70,
+        "user_scores": 12,
+        "recipients": 6,
+        "add_score": 8,
+        "admin_users": 2,
+        "admin_edit": 2,
+    },
+    # Seconds between two actions of a virtual user, picked uniformly.
+    "think_time": [0.2, 1.0],
+    # Seconds between login bursts; 0 only logs in once at the start.
+    "login_burst_interval": 15,
+    "recipients": 50,
+    "initial_scores": 2000,
+}
+
+PASSWORD = "load-test"
+
+
+class Stats:
+    """Latencies and failures per endpoint, shared by all virtual users."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.failures = defaultdict(lambda: defaultdict(int))
+
+    def add(self, endpoint: str, seconds: float, status: int | str):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not isinstance(status, int) or status >= 400:
+                self.failures[endpoint][str(status)] += 1
+
+
+class LockWaitMonitor:
+    """Time the first write statement of every transaction on the engine.
+
+    In WAL mode only writers wait for each other, and a transaction takes the
+    write lock at its first write statement, where SQLite then waits up to
+    the busy timeout. The duration of that statement is therefore the lock
+    wait plus its own, normally negligible, execution time. In-process it
+    also includes time spent waiting for other threads to release the GIL.
+    """
+
+    WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+    def __init__(self, engine):
+        self._lock = threading.Lock()
+        self.waits = []
+        self.locked_errors = 0
+        from sqlalchemy import event
+
+        event.listen(engine, "before_cursor_execute", self.before_execute)
+        event.listen(engine, "after_cursor_execute", self.after_execute)
+        event.listen(engine, "handle_error", self.on_error)
+        event.listen(engine, "commit", self.end_transaction)
+        event.listen(engine, "rollback", self.end_transaction)
+
+    def before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if "lock_wait_start" not in conn.info and not conn.info.get("has_written"):
+            if statement.lstrip().upper().startswith(self.WRITES):
+                conn.info["lock_wait_start"] = time.perf_counter()
+
+    def after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("lock_wait_start", None)
+        if start is not None:
+            conn.info["has_written"] = True
+            with self._lock:
+                self.waits.append(time.perf_counter() - start)
+
+    def on_error(self, context):
+        context.connection.info.pop("lock_wait_start", None)
+        if "database is locked" in str(context.original_exception):
+            with self._lock:
+                self.locked_errors += 1
+
+    def end_transaction(self, conn):
+        conn.info.pop("has_written", None)
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, body: dict | None = None) -> int:
+        return self.client.open(path, method=method, json=body).status_code
+
+
+class HTTPClient:
+    """A keep-alive connection to a running server that keeps the session cookie."""
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.connection = None
+        self.cookies = SimpleCookie()
+
+    def request(self, method: str, path: str, body: dict | None = None) -> int:
+        headers = {}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(
+                f"{name}={morsel.value}" for name, morsel in self.cookies.items()
+            )
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            self.connection.request(method, path, data, headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+        for cookie in response.headers.get_all("Set-Cookie") or []:
+            self.cookies.load(cookie)
+        if response.will_close:
+            self.connection.close()
+            self.connection = None
+        return response.status
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, client, email, recipient_ids, scenario, stats, start_time, deadline):
+        super().__init__(daemon=True)
+        self.client = client
+        self.email = email
+        self.recipient_ids = recipient_ids
+        self.scenario = scenario
+        self.stats = stats
+        self.start_time = start_time
+        self.deadline = deadline
+        self.random = random.Random(email)
+        actions = scenario["actions"]
+        self.actions = [getattr(self, name) for name in actions]
+        self.weights = list(actions.values())
+
+    def call(self, endpoint: str, method: str, path: str, body: dict | None = None):
+        start = time.perf_counter()
+        try:
+            status = self.client.request(method, path, body)
+        except Exception as ex:
+            status = type(ex).__name__
+        self.stats.add(endpoint, time.perf_counter() - start, status)
+
+    def login(self):
+        self.call(
+            "POST /auth/login",
+            "POST",
+            "/auth/login",
+            {"email": self.email, "password": PASSWORD},
+        )
+
+    def run(self):
+        interval = self.scenario["login_burst_interval"]
+        burst = 0
+        self.login()
+        while time.monotonic() < self.deadline:
+            if interval and time.monotonic() - self.start_time >= (burst + 1) * interval:
+                burst = int((time.monotonic() - self.start_time) // interval)
+                self.call("GET /auth/logout", "GET", "/auth/logout")
+                self.login()
+            self.random.choices(self.actions, self.weights)[0]()
+            time.sleep(self.random.uniform(*self.scenario["think_time"]))
+
+    def poll_scores(self):
+        self.call("GET /scores", "GET", "/scores")
+
+    def user_scores(self):
+        id = self.random.choice(self.recipient_ids)
+        self.call("GET /<id>/scores", "GET", f"/{id}/scores")
+
+    def recipients(self):
+        query = self.random.choice(("Lo", "Load", "Load recipient 1", "oad"))
+        path = "/score/recipients?" + urlencode({"q": query})
+        self.call("GET /score/recipients", "GET", path)
+
+    def add_score(self):
+        self.call(
+            "POST /score",
+            "POST",
+            "/score",
+            {
+                "userId": self.random.choice(self.recipient_ids),
+                "score": self.random.randint(-10, 50),
+                "description": "Load test",
+            },
+        )
+
+    def admin_users(self):
+        self.call("GET /admin/users", "GET", "/admin/users?limit=50")
+
+    def admin_edit(self):
+        index = self.random.randrange(len(self.recipient_ids))
+        self.call(
+            "PUT /admin/user",
+            "PUT",
+            "/admin/user",
+            {
+                "id": self.recipient_ids[index],
+                "email": f"load-recipient-{index}@example.com",
+                "name": f"Load recipient {index} {self.random.randint(0, 99)}",
+            },
+        )
+
+
+def seed(app, scenario, users: int) -> tuple[list[str], list[int]]:
+    """Add the accounts and scores the scenario needs, unless already there."""
+    from sqlalchemy import func
+    from werkzeug.security import generate_password_hash
+
+    from scoreboard import database, db
+    from scoreboard.enums import ClearanceEnum, DataVersionEnum
+    from scoreboard.model.board import DEFAULT_BOARD_ID
+    from scoreboard.model.scores import ScoreLog
+    from scoreboard.model.user import User
+
+    with app.app_context():
+        password = generate_password_hash(PASSWORD)
+        emails = [f"load-user-{i}@example.com" for i in range(users)]
+        recipient_emails = [
+            f"load-recipient-{i}@example.com" for i in range(scenario["recipients"])
+        ]
+        existing = database.get_existing_emails(emails + recipient_emails)
+        for i, email in enumerate(emails):
+            if email not in existing:
+                db.session.add(
+                    User(
+                        email=email,
+                        name=f"Load user {i}",
+                        password=password,
+                        needs_password_change=False,
+                        userTypeId=ClearanceEnum.User | ClearanceEnum.Admin,
+                    )
+                )
+        for i, email in enumerate(recipient_emails):
+            if email not in existing:
+                db.session.add(
+                    User(
+                        email=email,
+                        name=f"Load recipient {i}",
+                        password=password,
+                        needs_password_change=False,
+                        userTypeId=ClearanceEnum.User | ClearanceEnum.Wannabe,
+                    )
+                )
+        db.session.commit()
+
+        ids = dict(
+            db.session.execute(
+                db.select(User.email, User.id).where(User.email.in_(recipient_emails))
+            ).all()
+        )
+        recipient_ids = [ids[email] for email in recipient_emails]
+        giver_id = db.session.execute(
+            db.select(User.id).where(User.email == emails[0])
+        ).scalar_one()
+        missing = scenario["initial_scores"] - db.session.scalar(
+            db.select(func.count(ScoreLog.id)).filter_by(boardId=DEFAULT_BOARD_ID)
+        )
+        rng = random.Random(0)
+        for _ in range(max(missing, 0)):
+            db.session.add(
+                ScoreLog(
+                    userId=rng.choice(recipient_ids),
+                    addedById=giver_id,
+                    score=rng.randint(-10, 50),
+                    description="Load test seed",
+                )
+            )
+        database.bump_data_version(DataVersionEnum.Scores, DEFAULT_BOARD_ID)
+        db.session.commit()
+    return emails, recipient_ids
+
+
+def percentile(values, fraction):
+    if len(values) < 2:
+        return values[0] if values else float("nan")
+    return statistics.quantiles(values, n=100, method="inclusive")[int(fraction * 100) - 1]
+
+
+def summary(values) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.5) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+    }
+
+
+def report(stats: Stats, monitor: LockWaitMonitor | None, duration: float) -> dict:
+    endpoints = {}
+    for endpoint in sorted(stats.latencies):
+        latencies = stats.latencies[endpoint]
+        endpoints[endpoint] = {
+            **summary(latencies),
+            "per_second": len(latencies) / duration,
+            "failures": dict(stats.failures[endpoint]),
+        }
+    all_latencies = [l for latencies in stats.latencies.values() for l in latencies]
+    result = {
+        "duration": duration,
+        "total": {**summary(all_latencies), "per_second": len(all_latencies) / duration},
+        "endpoints": endpoints,
+        "lock_wait": None,
+    }
+    if monitor is not None:
+        result["lock_wait"] = {
+            **summary(monitor.waits),
+            "max_ms": max(monitor.waits, default=0) * 1000,
+            "total_s": sum(monitor.waits),
+            "locked_errors": monitor.locked_errors,
+        }
+    return result
+
+
+def print_report(result: dict):
+    row = "{:<24} {:>8} {:>8} {:>9} {:>9} {:>9}  {}"
+    print(row.format("endpoint", "requests", "req/s", "p50 ms", "p95 ms", "p99 ms", "failures"))
+    for endpoint, s in [*result["endpoints"].items(), ("total", result["total"])]:
+        print(
+            row.format(
+                endpoint,
+                s["count"],
+                f"{s['per_second']:.1f}",
+                f"{s['p50_ms']:.1f}",
+                f"{s['p95_ms']:.1f}",
+                f"{s['p99_ms']:.1f}",
+                ", ".join(f"{k}: {v}" for k, v in s.get("failures", {}).items()),
+            )
+        )
+    lock_wait = result["lock_wait"]
+    if lock_wait is None:
+        print("SQLite lock wait: only measured in-process")
+    else:
+        print(
+            f"SQLite lock wait: {lock_wait['count']} write transactions, "
+            f"total {lock_wait['total_s']:.2f}s, "
+            f"p50/p95/p99/max ms {lock_wait['p50_ms']:.1f}/{lock_wait['p95_ms']:.1f}/"
+            f"{lock_wait['p99_ms']:.1f}/{lock_wait['max_ms']:.1f}, "
+            f"'database is locked' errors: {lock_wait['locked_errors']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-u", "--users", type=int, default=20, help="Virtual users.")
+    parser.add_argument("-d", "--duration", type=float, default=30, help="Seconds.")
+    parser.add_argument("--scenario", help="JSON file overriding the default scenario.")
+    parser.add_argument("--url", help="Drive a running server instead of the app in-process.")
+    parser.add_argument("--output", help="Also write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    scenario = dict(DEFAULT_SCENARIO)
+    if args.scenario:
+        with open(args.scenario) as file:
+            scenario.update(json.load(file))
+
+    # An in-memory database is one connection shared by all threads, so
+    # default to a file to see real SQLite locking.
+    os.environ.setdefault(
+        "SQLALCHEMY_DATABASE_URI",
+        "sqlite:///" + os.path.join(tempfile.gettempdir(), "scoreboard-loadtest.db"),
+    )
+    os.environ.setdefault("SECRET_KEY", "load-test")
+    os.environ.setdefault("SCOREBOARD_DEVELOPMENT", "1")
+    os.environ.setdefault("SCOREBOARD_ADMIN_USER_EMAIL", "admin@example.com")
+    os.environ.setdefault("SCOREBOARD_ADMIN_USER_NAME", "Admin")
+    os.environ.setdefault("SCOREBOARD_ADMIN_USER_PASSWORD", PASSWORD)
+
+    from scoreboard import create_app, db
+
+    app = create_app()
+    emails, recipient_ids = seed(app, scenario, args.users)
+
+    monitor = None
+    if args.url is None:
+        with app.app_context():
+            monitor = LockWaitMonitor(db.engine)
+
+    stats = Stats()
+    start = time.monotonic()
+    deadline = start + args.duration
+    virtual_users = [
+        VirtualUser(
+            HTTPClient(args.url) if args.url else InProcessClient(app),
+            email,
+            recipient_ids,
+            scenario,
+            stats,
+            start,
+            deadline,
+        )
+        for email in emails
+    ]
+    for virtual_user in virtual_users:
+        virtual_user.start()
+    for virtual_user in virtual_users:
+        virtual_user.join()
+    duration = time.monotonic() - start
+
+    result = report(stats, monitor, duration)
+    print(f"virtual users: {args.users}, duration: {duration:.1f}s")
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"users": args.users, "scenario": scenario, **result}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
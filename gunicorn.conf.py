@@ -0,0 +1,49 @@
+"""Gunicorn configuration for production.
+
+Used by the Dockerfile with `gunicorn -c gunicorn.conf.py "scoreboard:create_app()"`.
+Every setting can be overridden with the environment variables below.
+
+The app is preloaded, so imports, create_app() and database seeding run once
+in the master before the workers are forked. An in-memory database is then
+copied into every worker and not shared, so use a database file in production.
+"""
+
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Requests mostly wait on SQLite and the network, so a few threaded workers
+# per CPU serve more than one synchronous worker. Flask-SQLAlchemy scopes
+# db.session to the app context, so every thread gets its own session.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", cpu_count * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+preload_app = True
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Recycle workers now and then to bound memory growth of per-worker caches.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG", None)
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """Drop the database connections inherited from the master.
+
+    SQLite connections must not be shared between processes, so each worker
+    opens its own, while the master keeps the ones it had.
+    """
+    from scoreboard import db
+
+    app = worker.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
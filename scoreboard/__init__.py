@@ -4,13 +4,14 @@ from logging.config import dictConfig
 from flask_restx import Api
 from flask import Flask, session, g
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from werkzeug.exceptions import HTTPException
 
 from scoreboard.model.model import BaseModel
 
 db = SQLAlchemy(engine_options={"pool_pre_ping": True}, model_class=BaseModel)
 
-def create_app() -> Flask:
+def create_app(test_config: dict | None = None) -> Flask:
     app = Flask(__name__, instance_relative_config=True)
     api = Api(app,title="Familjen scoreboard API", description="")
 
@@ -26,14 +27,37 @@ def create_app() -> Flask:
         SCOREBOARD_ADMIN_USER_NAME=os.getenv("SCOREBOARD_ADMIN_USER_NAME"),
         SCOREBOARD_ADMIN_USER_PASSWORD=os.getenv("SCOREBOARD_ADMIN_USER_PASSWORD"),
         SCOREBOARD_DEVELOPMENT=os.getenv("SCOREBOARD_DEVELOPMENT", False),
+        SCOREBOARD_SNAPSHOT_INTERVAL=os.getenv("SCOREBOARD_SNAPSHOT_INTERVAL", 86400),
+        SCOREBOARD_CHANGES_RETENTION=os.getenv("SCOREBOARD_CHANGES_RETENTION", 2592000),
+        SCOREBOARD_CHANGES_MAX_ROWS=os.getenv("SCOREBOARD_CHANGES_MAX_ROWS", 100000),
+        SCOREBOARD_COMPRESSION_MIN_SIZE=os.getenv(
+            "SCOREBOARD_COMPRESSION_MIN_SIZE", 1024
+        ),
+        SCOREBOARD_ASGI_POOL_SIZE=os.getenv("SCOREBOARD_ASGI_POOL_SIZE", 10),
+        SCOREBOARD_QUERY_BUDGET=os.getenv("SCOREBOARD_QUERY_BUDGET", 10),
+        SCOREBOARD_BACKUP_DIR=os.getenv("SCOREBOARD_BACKUP_DIR"),
+        SCOREBOARD_BACKUP_PAGES=os.getenv("SCOREBOARD_BACKUP_PAGES", 100),
+        SCOREBOARD_BACKUP_PAUSE=os.getenv("SCOREBOARD_BACKUP_PAUSE", 0.01),
+        SCOREBOARD_WEBHOOK_BATCH_WINDOW=os.getenv("SCOREBOARD_WEBHOOK_BATCH_WINDOW", 0.5),
+        SCOREBOARD_WEBHOOK_BATCH_SIZE=os.getenv("SCOREBOARD_WEBHOOK_BATCH_SIZE", 100),
+        SCOREBOARD_WEBHOOK_TIMEOUT=os.getenv("SCOREBOARD_WEBHOOK_TIMEOUT", 5),
+        SCOREBOARD_WEBHOOK_RETRIES=os.getenv("SCOREBOARD_WEBHOOK_RETRIES", 5),
+        SCOREBOARD_WEBHOOK_BACKOFF=os.getenv("SCOREBOARD_WEBHOOK_BACKOFF", 1),
     )
 
-    app.config.from_pyfile("config.py", silent=True)
+    if test_config is None:
+        app.config.from_pyfile("config.py", silent=True)
+    else:
+        app.config.from_mapping(test_config)
 
     os.makedirs(app.instance_path, exist_ok=True)
 
     db.init_app(app)
 
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            event.listen(db.engine, "connect", set_sqlite_pragmas)
+
     from . import init_data
 
     init_data.init_db(app, db)
@@ -51,6 +75,48 @@ def create_app() -> Flask:
 
     api.add_namespace(admin.ns)
 
+    from . import provisioning
+
+    app.cli.add_command(provisioning.import_users_command)
+
+    from . import snapshots
+
+    app.cli.add_command(snapshots.snapshot_leaderboard_command)
+
+    from . import badges
+
+    app.cli.add_command(badges.backfill_badges_command)
+
+    from . import changes
+
+    app.cli.add_command(changes.compact_changes_command)
+
+    from . import search
+
+    app.cli.add_command(search.rebuild_search_index_command)
+
+    from . import query_plans
+
+    app.cli.add_command(query_plans.check_query_plans_command)
+
+    from . import backup
+
+    app.cli.add_command(backup.backup_database_command)
+    app.cli.add_command(backup.restore_database_command)
+
+    from . import webhooks
+
+    webhooks.init_app(app)
+    app.cli.add_command(webhooks.webhook_receiver_command)
+
+    from . import compression
+
+    compression.init_app(app, api)
+
+    from . import query_budget
+
+    query_budget.init_app(app)
+
     app.register_error_handler(HTTPException, error_page)
 
     @app.route("/healthz")
@@ -114,5 +180,14 @@ def create_app() -> Flask:
     return app
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers in other threads and workers run while a write is in progress.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
 def error_page(e):
     return {"status": e.code, "message": e.description}, e.code
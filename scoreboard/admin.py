@@ -1,3 +1,4 @@
+import secrets
 import smtplib
 from uuid import uuid4
 
@@ -9,27 +10,56 @@ from flask import (
 
 from werkzeug.security import generate_password_hash
 
-from scoreboard import database
+from scoreboard import backup, compression, database
 from scoreboard.auth import admin_required, login_required
 from scoreboard.database import (
     add_user_role,
+    add_users_role,
     get_user,
-    get_users,
+    get_users_page,
     remove_user_role,
+    remove_users_role,
     reset_user_password,
 )
 from flask_restx import Namespace, Resource
 from scoreboard.enums import ClearanceEnum
-from scoreboard.model.user import User
+from scoreboard.model.board import Board as BoardModel
+from scoreboard.model.user import User as UserModel
+from scoreboard.model.webhook import Webhook as WebhookModel
+from scoreboard.provisioning import invitation_email, parse_user_csv, provision_users
+from scoreboard.query_budget import query_budget
 from scoreboard.util import send_email
-from scoreboard.api_models.user import user_model, user_type_model
+from scoreboard.api_models.user import (
+    user_import_result_model,
+    user_model,
+    user_page_model,
+    user_type_model,
+)
+from scoreboard.api_models.backup import backup_model
+from scoreboard.api_models.board import board_model
 from scoreboard.api_models.common import error_response, success_response
-from scoreboard.parsers.admin_parsers import insert_user_parser, update_user_parser
+from scoreboard.api_models.webhook import webhook_model, webhook_secret_model
+from scoreboard.parsers.admin_parsers import (
+    backup_parser,
+    board_parser,
+    insert_user_parser,
+    update_user_parser,
+    user_ids_parser,
+    user_import_parser,
+    user_list_parser,
+    webhook_parser,
+)
 from scoreboard.parsers.common_parsers import id_parser
 
 ns = Namespace("admin", description="Admin endpoints. Allows user management for admins.", default="Admin", default_label="Admin")
 ns.models[user_model.name] = user_model
 ns.models[user_type_model.name] = user_type_model
+ns.models[user_page_model.name] = user_page_model
+ns.models[user_import_result_model.name] = user_import_result_model
+ns.models[backup_model.name] = backup_model
+ns.models[board_model.name] = board_model
+ns.models[webhook_model.name] = webhook_model
+ns.models[webhook_secret_model.name] = webhook_secret_model
 ns.models[error_response.name] = error_response
 ns.models[success_response.name] = success_response
 
@@ -38,18 +68,35 @@ ns.models[success_response.name] = success_response
 class Users(Resource):
     method_decorators = [login_required, admin_required]
 
-    @ns.marshal_with(user_model)
+    # A page sorted by last login can span the users who never logged in and
+    # those who have, which are read separately.
+    @query_budget(3)
+    @ns.expect(user_list_parser)
+    @ns.marshal_with(user_page_model)
+    @ns.response(400, "Validation error")
     @ns.response(401, "Unauthorized")
     @ns.response(403, "Forbidden")
     def get(self):
-        users = get_users()
-        return users
+        args = user_list_parser.parse_args(strict=True)
+
+        try:
+            users, next_cursor = get_users_page(
+                search=args.search,
+                sort=args.sort,
+                descending=args.desc,
+                cursor=args.cursor,
+                limit=args.limit,
+            )
+        except ValueError:
+            abort(400, "Ogiltig cursor!")
+        return {"users": users, "next_cursor": next_cursor}
 
 
 @ns.route("/user")
 class User(Resource):
     method_decorators = [login_required, admin_required]
 
+    @query_budget(3)
     @ns.expect(id_parser)
     @ns.response(400, "Validation error")
     @ns.response(401, "Unauthorized")
@@ -65,6 +112,7 @@ class User(Resource):
             abort(404, "Användare hittades ej!")
         return user
 
+    @query_budget(6)
     @ns.expect(insert_user_parser)
     @ns.response(400, "Validation error")
     @ns.response(401, "Unauthorized")
@@ -81,6 +129,7 @@ class User(Resource):
             abort(400, "Något gick fel!")
         return user
 
+    @query_budget(7)
     @ns.expect(update_user_parser)
     @ns.response(400, "Validation error")
     @ns.response(401, "Unauthorized")
@@ -103,6 +152,7 @@ class User(Resource):
 
         return user
 
+    @query_budget(9)
     @ns.expect(id_parser)
     @ns.response(204, "Success")
     @ns.response(400, "Validation error")
@@ -126,6 +176,7 @@ class User(Resource):
 class ResetPassword(Resource):
     method_decorators = [login_required, admin_required]
 
+    @query_budget(5)
     @ns.expect(id_parser)
     @ns.response(400, "Validation error")
     @ns.response(401, "Unauthorized")
@@ -175,6 +226,7 @@ Ovanstående lösenord är temporärt och vid första inloggning kommer du behö
 class Admin(Resource):
     method_decorators = [login_required, admin_required]
 
+    @query_budget(5)
     @ns.response(401, "Unauthorized")
     @ns.response(403, "Forbidden")
     @ns.response(404, "Not found")
@@ -185,6 +237,7 @@ class Admin(Resource):
             abort(404, "Användare hittades inte!")
         return get_user(id)
 
+    @query_budget(5)
     @ns.response(400, "Validation error")
     @ns.response(401, "Unauthorized")
     @ns.response(403, "Forbidden")
@@ -203,6 +256,7 @@ class Admin(Resource):
 class Wannabe(Resource):
     method_decorators = [login_required, admin_required]
 
+    @query_budget(5)
     @ns.response(401, "Unauthorized")
     @ns.response(403, "Forbidden")
     @ns.response(404, "Not found")
@@ -213,6 +267,7 @@ class Wannabe(Resource):
             abort(404, "Användare hittades inte!")
         return get_user(id)
 
+    @query_budget(5)
     @ns.response(400, "Validation error")
     @ns.response(401, "Unauthorized")
     @ns.response(403, "Forbidden")
@@ -225,16 +280,108 @@ class Wannabe(Resource):
         return get_user(id)
 
 
+@ns.route("/users/import")
+class UserImport(Resource):
+    method_decorators = [login_required, admin_required]
+
+    @query_budget(6)
+    @ns.expect(user_import_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.marshal_with(user_import_result_model)
+    def post(self):
+        args = user_import_parser.parse_args(strict=True)
+
+        try:
+            rows = parse_user_csv(args.file.read().decode("utf-8-sig"))
+        except (UnicodeDecodeError, ValueError):
+            abort(400, "Ogiltig CSV-fil!")
+        return provision_users(rows, request.url_root)
+
+
+@ns.route("/users/admin")
+class BulkAdmin(Resource):
+    method_decorators = [login_required, admin_required]
+
+    @query_budget(4)
+    @ns.expect(user_ids_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.marshal_with(user_model)
+    def put(self):
+        ids = parse_user_ids()
+        return add_users_role(ids, ClearanceEnum.Admin)
+
+    @query_budget(4)
+    @ns.expect(user_ids_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.marshal_with(user_model)
+    def delete(self):
+        ids = parse_user_ids()
+        if g.user.id in ids:
+            abort(400, "Du kan inte plocka bort admin från dig själv!")
+        return remove_users_role(ids, ClearanceEnum.Admin)
+
+
+@ns.route("/users/wannabe")
+class BulkWannabe(Resource):
+    method_decorators = [login_required, admin_required]
+
+    @query_budget(4)
+    @ns.expect(user_ids_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.marshal_with(user_model)
+    def put(self):
+        ids = parse_user_ids()
+        return add_users_role(ids, ClearanceEnum.Wannabe)
+
+    @query_budget(4)
+    @ns.expect(user_ids_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.marshal_with(user_model)
+    def delete(self):
+        ids = parse_user_ids()
+        return remove_users_role(ids, ClearanceEnum.Wannabe)
+
+
+@ns.route("/compression")
+class CompressionStats(Resource):
+    method_decorators = [login_required, admin_required]
+
+    @query_budget(1)
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    def get(self):
+        """Bytes and CPU time spent and saved by response compression in this worker."""
+        return compression.stats.as_dict()
+
+
+def parse_user_ids() -> list[int]:
+    args = user_ids_parser.parse_args(strict=True)
+    ids = list(dict.fromkeys(args.ids))
+    for id in ids:
+        validate_user_id(id)
+    return ids
+
+
 def validate_user_id(id: int):
     is_protected_user = id < 1
     if is_protected_user:
         return abort(403)
 
 
-def add_user(name: str, email: str) -> User | None:
+def add_user(name: str, email: str) -> UserModel | None:
     temp_password = str(uuid4())
 
-    user = User(
+    user = UserModel(
         email=email.lower(),
         name=name,
         password=generate_password_hash(temp_password),
@@ -245,20 +392,111 @@ def add_user(name: str, email: str) -> User | None:
         return None
 
     try:
-        send_email(
-            email,
-            "Konto för poänglista skapat!",
-            f"""Hej
+        send_email(email, *invitation_email(email, temp_password, request.url_root))
+    except smtplib.SMTPException:
+        return None
+    return user
 
-Det har skapats ett konto åt dig för att kunna hantera poänglistan. Inloggningsuppgifter står nedan.
 
-Länk: {request.root_url}
-Användarnamn: {email}
-Lösenord: {temp_password}
+@ns.route("/backups")
+class Backups(Resource):
+    method_decorators = [login_required, admin_required]
 
-Ovanstående lösenord är temporärt och vid första inloggning kommer du behöva byta ditt lösenord.
-""",
+    @query_budget(1)
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.marshal_with(backup_model)
+    def get(self):
+        """Backups in the backup directory, newest first."""
+        return backup.list_backups()
+
+    @query_budget(1)
+    @ns.expect(backup_parser)
+    @ns.response(202, "Backup started")
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.response(409, "A backup is already running")
+    @ns.marshal_with(backup_model, code=202)
+    def post(self):
+        """Start an online backup of the database in the background."""
+        args = backup_parser.parse_args(strict=True)
+
+        try:
+            result = backup.backup_job.start(args.compress)
+        except ValueError:
+            abort(400, "Databasen kan inte säkerhetskopieras!")
+        except RuntimeError:
+            abort(409, "En säkerhetskopiering pågår redan!")
+        return result.as_dict(), 202
+
+
+@ns.route("/board")
+class Board(Resource):
+    method_decorators = [login_required, admin_required]
+
+    @query_budget(4)
+    @ns.expect(board_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.marshal_with(board_model)
+    def post(self):
+        args = board_parser.parse_args(strict=True)
+
+        board = BoardModel(name=args.name)
+        if not database.add_board(board):
+            abort(400, "Det finns redan en tavla med det namnet!")
+        return board
+
+
+@ns.route("/webhooks")
+class Webhooks(Resource):
+    method_decorators = [login_required, admin_required]
+
+    @query_budget(2)
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.marshal_with(webhook_model)
+    def get(self):
+        return database.get_webhooks()
+
+
+@ns.route("/webhook")
+class Webhook(Resource):
+    method_decorators = [login_required, admin_required]
+
+    @query_budget(4)
+    @ns.expect(webhook_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.response(404, "Not found")
+    @ns.marshal_with(webhook_secret_model)
+    def post(self):
+        args = webhook_parser.parse_args(strict=True)
+
+        if args.boardId is not None and not database.get_board(args.boardId):
+            abort(404, "Tavlan hittades ej!")
+
+        # The secret is only shown here, the receiver verifies deliveries with it.
+        webhook = WebhookModel(
+            url=args.url, secret=secrets.token_urlsafe(32), boardId=args.boardId
         )
-    except smtplib.SMTPException:
-        return None
-    return user
+        if not database.add_webhook(webhook):
+            abort(400, "Något gick fel!")
+        return webhook
+
+    @query_budget(3)
+    @ns.expect(id_parser)
+    @ns.response(204, "Success")
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(403, "Forbidden")
+    @ns.response(404, "Not found")
+    def delete(self):
+        args = id_parser.parse_args(strict=True)
+
+        if not database.delete_webhook(args.id):
+            abort(404, "Webhook hittades ej!")
+        return "", 204
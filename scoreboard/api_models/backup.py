@@ -0,0 +1,23 @@
+from flask_restx import fields, Model
+
+backup_model = Model(
+    "Backup",
+    {
+        "name": fields.String,
+        "status": fields.String,
+        "started": fields.DateTime,
+        "duration": fields.Float,
+        "journal_mode": fields.String,
+        "compressed": fields.Boolean,
+        "size": fields.Integer,
+        "pages": fields.Integer,
+        "steps": fields.Integer,
+        "restarts": fields.Integer,
+        "lock_seconds": fields.Float,
+        "max_lock_seconds": fields.Float,
+        "integrity": fields.String,
+        "row_counts": fields.Raw,
+        "verified": fields.Boolean,
+        "error": fields.String,
+    },
+)
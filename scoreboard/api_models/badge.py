@@ -0,0 +1,11 @@
+from flask_restx import fields, Model
+
+user_badge_model = Model(
+    "UserBadge",
+    {
+        "badge": fields.String,
+        "title": fields.String,
+        "description": fields.String,
+        "time": fields.DateTime,
+    },
+)
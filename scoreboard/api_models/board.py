@@ -0,0 +1,10 @@
+from flask_restx import fields, Model
+
+board_model = Model(
+    "Board",
+    {
+        "id": fields.Integer,
+        "name": fields.String,
+        "created": fields.DateTime,
+    },
+)
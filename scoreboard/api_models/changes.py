@@ -0,0 +1,23 @@
+from flask_restx import fields, Model
+
+change_model = Model(
+    "Change",
+    {
+        "id": fields.Integer,
+        "time": fields.DateTime,
+        "entity": fields.String,
+        "entity_id": fields.Integer,
+        "operation": fields.String,
+        "data": fields.Raw,
+    },
+)
+
+change_feed_model = Model(
+    "ChangeFeed",
+    {
+        "changes": fields.List(fields.Nested(change_model)),
+        "cursor": fields.Integer,
+        "has_more": fields.Boolean,
+        "resync_required": fields.Boolean,
+    },
+)
@@ -21,3 +21,89 @@ score_list_model = Model(
         "score": fields.Integer,
     },
 )
+
+score_giver_model = Model(
+    "ScoreGiver",
+    {
+        "id": fields.Integer,
+        "name": fields.String,
+        "count": fields.Integer,
+        "total": fields.Integer,
+    },
+)
+
+biggest_award_model = Model(
+    "BiggestAward",
+    {
+        "score": fields.Integer,
+        "time": fields.DateTime,
+    },
+)
+
+score_stats_model = Model(
+    "ScoreStats",
+    {
+        "user": fields.Nested(public_user_model),
+        "count": fields.Integer,
+        "total": fields.Integer,
+        "mean": fields.Float,
+        "std": fields.Float,
+        "min": fields.Integer,
+        "max": fields.Integer,
+        "longest_positive_streak": fields.Integer,
+        "biggest_award": fields.Nested(biggest_award_model, allow_null=True),
+        "givers": fields.List(fields.Nested(score_giver_model)),
+    },
+)
+
+series_point_model = Model(
+    "SeriesPoint",
+    {
+        "time": fields.DateTime,
+        "score": fields.Integer,
+    },
+)
+
+score_series_model = Model(
+    "ScoreSeries",
+    {
+        "user": fields.Nested(public_user_model),
+        "points": fields.List(fields.Nested(series_point_model)),
+    },
+)
+
+ranked_score_model = Model(
+    "RankedScore",
+    {
+        "user": fields.Nested(public_user_model),
+        "score": fields.Integer,
+        "rank": fields.Integer,
+    },
+)
+
+rank_mover_model = Model(
+    "RankMover",
+    {
+        "user": fields.Nested(public_user_model),
+        "start_rank": fields.Integer,
+        "end_rank": fields.Integer,
+        "rank_change": fields.Integer,
+        "score_change": fields.Integer,
+    },
+)
+
+score_search_hit_model = score_model.inherit(
+    "ScoreSearchHit",
+    {
+        "snippet": fields.String,
+    },
+)
+
+score_search_model = Model(
+    "ScoreSearch",
+    {
+        "results": fields.List(fields.Nested(score_search_hit_model)),
+        "page": fields.Integer,
+        "has_more": fields.Boolean,
+    },
+)
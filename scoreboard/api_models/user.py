@@ -21,3 +21,23 @@ public_user_model = Model(
         "name": fields.String,
     },
 )
+
+user_page_model = Model(
+    "UserPage",
+    {
+        "users": fields.List(fields.Nested(user_model)),
+        "next_cursor": fields.String,
+    },
+)
+
+user_import_result_model = Model(
+    "UserImportResult",
+    {
+        "row": fields.Integer,
+        "name": fields.String,
+        "email": fields.String,
+        "status": fields.String,
+        "message": fields.String,
+        "id": fields.Integer,
+    },
+)
@@ -0,0 +1,18 @@
+from flask_restx import fields, Model
+
+webhook_model = Model(
+    "Webhook",
+    {
+        "id": fields.Integer,
+        "url": fields.String,
+        "boardId": fields.Integer,
+        "created": fields.DateTime,
+    },
+)
+
+webhook_secret_model = webhook_model.inherit(
+    "WebhookWithSecret",
+    {
+        "secret": fields.String,
+    },
+)
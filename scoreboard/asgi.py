@@ -0,0 +1,257 @@
+"""Asynchronous, read-only ASGI app for the high fan-out public endpoints.
+
+Serves the leaderboard, user ranks and score histories from an asyncio
+SQLite driver with a connection pool. Idle displays and long-polling clients
+then hold a coroutine instead of a whole synchronous worker. The models and
+response shapes are the same as in the Flask app, and the Flask session
+cookie is accepted for the endpoints that need a login.
+
+Every endpoint is also served for other boards under /boards/<id>.
+
+Run with e.g. `uvicorn --factory scoreboard.asgi:create_asgi_app`.
+"""
+
+import asyncio
+import json
+import re
+from http.cookies import SimpleCookie
+from typing import Any, Awaitable, Callable
+from urllib.parse import parse_qs
+
+from flask import Flask
+from flask_restx import marshal
+from itsdangerous import BadSignature
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import joinedload
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from scoreboard import create_app
+from scoreboard.database import data_version_name
+from scoreboard.api_models.scores import (
+    ranked_score_model,
+    score_list_model,
+    score_model,
+)
+from scoreboard.enums import DataVersionEnum
+from scoreboard.model.board import DEFAULT_BOARD_ID, Board
+from scoreboard.model.scores import ScoreLog
+from scoreboard.model.user import User
+from scoreboard.model.version import DataVersion
+
+# Longest time a long-polling leaderboard request waits for a change.
+LONG_POLL_TIMEOUT = 25
+LONG_POLL_INTERVAL = 1
+
+_board_prefix = r"(?:/boards/(?P<board_id>\d+))?"
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        self.status = status
+        self.message = message
+
+
+def to_async_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.removeprefix("sqlite://")
+    return url
+
+
+class ReadOnlyApp:
+    def __init__(self, flask_app: Flask, engine: AsyncEngine):
+        self.flask_app = flask_app
+        self.engine = engine
+        self.sessions = async_sessionmaker(engine, expire_on_commit=False)
+        session_interface = flask_app.session_interface
+        self.session_serializer = session_interface.get_signing_serializer(flask_app)  # type: ignore
+        self.routes: list[tuple[re.Pattern, Callable[..., Awaitable[Any]]]] = [
+            (re.compile(_board_prefix + r"/scores"), self.scores),
+            (re.compile(_board_prefix + r"/(?P<id>\d+)/rank"), self.rank),
+            (re.compile(_board_prefix + r"/(?P<id>\d+)/scores"), self.user_scores),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        headers = {"content-type": "application/json"}
+        try:
+            if scope["method"] not in ("GET", "HEAD"):
+                raise HTTPError(405, "Method not allowed")
+            handler, params = self.match(scope["path"])
+            async with self.sessions() as session:
+                if "board_id" in params:
+                    await self.check_board(session, params["board_id"])
+                body, extra_headers = await handler(session, scope, **params)
+            headers.update(extra_headers)
+            status = 200
+        except HTTPError as error:
+            status = error.status
+            body = {"status": error.status, "message": error.message}
+
+        payload = json.dumps(body).encode()
+        headers["content-length"] = str(len(payload))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": payload if scope["method"] != "HEAD" else b"",
+            }
+        )
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def match(self, path: str):
+        for pattern, handler in self.routes:
+            match = pattern.fullmatch(path)
+            if match:
+                params = match.groupdict()
+                return handler, {k: int(v) for k, v in params.items() if v is not None}
+        raise HTTPError(404, "Not found")
+
+    async def current_user(self, session: AsyncSession, scope) -> User:
+        """Return the user logged in with the Flask session cookie, like login_required."""
+        cookies = SimpleCookie()
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookies.load(value.decode("latin-1"))
+        cookie = cookies.get(self.flask_app.config["SESSION_COOKIE_NAME"])
+        user = None
+        if cookie is not None:
+            max_age = int(self.flask_app.permanent_session_lifetime.total_seconds())
+            try:
+                data = self.session_serializer.loads(cookie.value, max_age=max_age)
+            except BadSignature:
+                data = {}
+            if "user_id" in data:
+                user = await session.get(User, data["user_id"])
+        if user is None:
+            raise HTTPError(401, "Du är ej inloggad!")
+        if user.needs_password_change:
+            raise HTTPError(403, "Du måste byta lösenord!")
+        return user
+
+    async def check_board(self, session: AsyncSession, board_id: int):
+        if await session.get(Board, board_id) is None:
+            raise HTTPError(404, "Tavlan hittades ej!")
+
+    async def scores_version(self, session: AsyncSession, board_id: int) -> int:
+        version = await session.scalar(
+            select(DataVersion.version).filter_by(
+                name=data_version_name(DataVersionEnum.Scores, board_id)
+            )
+        )
+        return version or 0
+
+    async def scores(
+        self, session: AsyncSession, scope, board_id: int = DEFAULT_BOARD_ID
+    ):
+        """The leaderboard, as GET /scores.
+
+        With ?version=<n> the request waits until the scores data version
+        differs from n, so displays can long-poll for changes.
+        """
+        query = parse_qs(scope["query_string"].decode())
+        version = await self.scores_version(session, board_id)
+        if "version" in query:
+            try:
+                known_version = int(query["version"][0])
+            except ValueError:
+                raise HTTPError(400, "Ogiltig version!")
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + LONG_POLL_TIMEOUT
+            while version == known_version and loop.time() < deadline:
+                # Return the connection to the pool while waiting. The next
+                # read starts a new transaction, so it sees new commits.
+                await session.close()
+                await asyncio.sleep(LONG_POLL_INTERVAL)
+                version = await self.scores_version(session, board_id)
+
+        # The same query as database.get_scores_aggregated, so scores of
+        # deleted users are listed like in the Flask app.
+        total = func.sum(ScoreLog.score).label("score")
+        rows = await session.execute(
+            select(User, total)
+            .select_from(ScoreLog)
+            .outerjoin(User, User.id == ScoreLog.userId)
+            .where(ScoreLog.boardId == board_id)
+            .group_by(ScoreLog.userId)
+            .order_by(total.desc())
+        )
+        scores = [{"user": user, "score": score} for user, score in rows]
+        return marshal(scores, score_list_model), {"x-data-version": str(version)}
+
+    async def rank(
+        self, session: AsyncSession, scope, id: int, board_id: int = DEFAULT_BOARD_ID
+    ):
+        total = func.sum(ScoreLog.score)
+        ranked = (
+            select(
+                ScoreLog.userId,
+                total.label("score"),
+                func.rank().over(order_by=total.desc()).label("rank"),
+            )
+            .where(ScoreLog.boardId == board_id)
+            .group_by(ScoreLog.userId)
+            .subquery()
+        )
+        row = (
+            await session.execute(
+                select(User, ranked.c.score, ranked.c.rank)
+                .join(ranked, ranked.c.userId == User.id)
+                .where(User.id == id)
+            )
+        ).first()
+        if row is None:
+            raise HTTPError(404, "Användare hittades ej.")
+        user, score, rank = row
+        ranked_score = {"user": user, "score": score, "rank": rank}
+        return marshal(ranked_score, ranked_score_model), {}
+
+    async def user_scores(
+        self, session: AsyncSession, scope, id: int, board_id: int = DEFAULT_BOARD_ID
+    ):
+        """A user's score history, as GET /<id>/scores."""
+        await self.current_user(session, scope)
+        scores = await session.scalars(
+            select(ScoreLog)
+            .options(joinedload(ScoreLog.user), joinedload(ScoreLog.addedBy))
+            .filter_by(boardId=board_id, userId=id)
+            .order_by(ScoreLog.time.desc())
+        )
+        return marshal(list(scores), score_model), {}
+
+
+def create_asgi_app() -> ReadOnlyApp:
+    flask_app = create_app()
+    url = to_async_url(flask_app.config["SQLALCHEMY_DATABASE_URI"])
+    engine_options: dict[str, Any] = {"pool_pre_ping": True}
+    if ":memory:" not in url:
+        engine_options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=int(flask_app.config["SCOREBOARD_ASGI_POOL_SIZE"]),
+        )
+    return ReadOnlyApp(flask_app, create_async_engine(url, **engine_options))
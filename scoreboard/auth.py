@@ -22,6 +22,7 @@ from scoreboard.model.user import User
 from scoreboard.api_models.user import user_model, user_type_model
 from scoreboard.api_models.common import error_response, success_response
 from scoreboard.parsers.auth_parsers import login_parser, change_password_parser
+from scoreboard.query_budget import query_budget
 
 ns = Namespace("auth", description="Authentication endpoints. Handles login, logout, and change of password.", default="Auth", default_label="Authentication")
 ns.models[user_model.name] = user_model
@@ -59,6 +60,7 @@ def admin_required(view):
 @ns.route("/login")
 class Login(Resource):
 
+    @query_budget(4)
     @ns.response(400, "Validation error")
     @ns.marshal_with(user_model)
     @ns.expect(login_parser)
@@ -90,6 +92,7 @@ class Login(Resource):
 class ChangePassword(Resource):
     method_decorators = [login_required]
 
+    @query_budget(3)
     @ns.expect(change_password_parser)
     @ns.response(204, "Success")
     @ns.response(400, "Validation error")
@@ -122,6 +125,7 @@ class ChangePassword(Resource):
 @ns.route("/logout")
 class Logout(Resource):
 
+    @query_budget(1)
     @ns.response(204, "Success")
     def get(self):
         session.clear()
@@ -0,0 +1,115 @@
+import threading
+from bisect import bisect_left
+from typing import Sequence
+
+from scoreboard import database
+from scoreboard.enums import DataVersionEnum
+
+
+class RecipientIndex:
+    """Sorted prefix index over the names and emails of score recipients.
+
+    Every user is indexed under its full name, each word of its name and its
+    email, all lowercased. Prefix lookups are a bisect into the sorted keys.
+    Queries with too few prefix matches are filled up with the keys closest
+    to them by edit distance, where swapping two adjacent characters counts
+    as one edit. Only keys starting with the first or second character of
+    the query are compared, so a typo in the first character is found when
+    it swaps the first two characters or adds one before them, but not when
+    it replaces or drops the first character.
+    """
+
+    def __init__(self, version: int, users: Sequence[tuple[int, str, str]]):
+        self.version = version
+        self.names = {id: name for id, name, _ in users}
+        entries = set()
+        for id, name, email in users:
+            name = name.lower()
+            entries.add((name, id))
+            entries.update((word, id) for word in name.split())
+            entries.add((email.lower(), id))
+        entries = sorted(entries)
+        self.keys = [key for key, _ in entries]
+        self.ids = [id for _, id in entries]
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        query = query.lower()
+        found: dict[int, None] = {}
+        position = bisect_left(self.keys, query)
+        while (
+            len(found) < limit
+            and position < len(self.keys)
+            and self.keys[position].startswith(query)
+        ):
+            found.setdefault(self.ids[position])
+            position += 1
+
+        if len(found) < limit and len(query) >= 3:
+            max_distance = 1 if len(query) < 6 else 2
+            distances: dict[int, int] = {}
+            for first in dict.fromkeys(query[:2]):
+                start = bisect_left(self.keys, first)
+                end = bisect_left(self.keys, chr(ord(first) + 1), start)
+                for position in range(start, end):
+                    id = self.ids[position]
+                    if id in found:
+                        continue
+                    distance = _prefix_distance(
+                        query, self.keys[position], max_distance
+                    )
+                    if distance < distances.get(id, max_distance + 1):
+                        distances[id] = distance
+            closest = sorted(
+                distances, key=lambda id: (distances[id], self.names[id].lower(), id)
+            )
+            found.update(dict.fromkeys(closest[: limit - len(found)]))
+
+        return [{"id": id, "name": self.names[id]} for id in found]
+
+
+def _prefix_distance(query: str, key: str, max_distance: int) -> int:
+    """Edit distance between query and the closest prefix of key, bounded by max_distance.
+
+    This is the optimal string alignment distance, in which swapping two
+    adjacent characters is one edit.
+    """
+    before_previous: list[int] = []
+    previous = list(range(len(key) + 1))
+    for i, query_char in enumerate(query, 1):
+        current = [i]
+        for j, key_char in enumerate(key, 1):
+            distance = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (query_char != key_char),
+            )
+            if (
+                i > 1
+                and j > 1
+                and query_char == key[j - 2]
+                and query[i - 2] == key_char
+            ):
+                distance = min(distance, before_previous[j - 2] + 1)
+            current.append(distance)
+        if min(current) > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    return min(previous)
+
+
+_index: RecipientIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_recipient_index() -> RecipientIndex:
+    """Return this worker's recipient index, rebuilding it if the users have changed."""
+    global _index
+    version = database.get_data_version(DataVersionEnum.Users)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = RecipientIndex(version, database.get_score_recipients())
+        return _index
@@ -0,0 +1,347 @@
+"""Online backups of the SQLite database with the SQLite backup API.
+
+The database is copied a few pages at a time with a pause in between, so a
+backup never holds a lock for long. In WAL mode the whole backup reads one
+snapshot in a single read transaction, which never blocks writers, and the
+row counts of the copy are compared with the source in that same snapshot.
+Other journal modes lock writers out during every step, and a write between
+steps makes SQLite restart the copy.
+
+Every backup gets a JSON manifest next to it with its verification results
+and lock times, which is also how admins see backups started from the API.
+"""
+
+import dataclasses
+import datetime
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from scoreboard import db, series
+
+COMPRESSED_SUFFIX = ".gz"
+
+
+@dataclasses.dataclass
+class BackupResult:
+    name: str
+    path: str
+    status: str = "running"
+    started: datetime.datetime = dataclasses.field(
+        default_factory=lambda: datetime.datetime.now(datetime.UTC)
+    )
+    duration: float | None = None
+    journal_mode: str | None = None
+    compressed: bool = False
+    size: int | None = None
+    pages: int | None = None
+    steps: int = 0
+    restarts: int = 0
+    # Time spent inside backup steps, when the source is locked. In WAL mode
+    # these are read locks, which do not block writers.
+    lock_seconds: float = 0.0
+    max_lock_seconds: float = 0.0
+    integrity: str | None = None
+    row_counts: dict[str, int] | None = None
+    verified: bool | None = None
+    error: str | None = None
+
+    def as_dict(self) -> dict:
+        result = dataclasses.asdict(self)
+        result["started"] = self.started.isoformat()
+        return result
+
+    def write_manifest(self):
+        with open(self.path + ".json", "w") as file:
+            json.dump(self.as_dict(), file, indent=2)
+
+
+def database_path() -> str:
+    """Return the path of the app's SQLite database file.
+
+    Raises ValueError if the database is not a SQLite file.
+    """
+    url = db.engine.url
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise ValueError("Only SQLite database files can be backed up")
+    return url.database  # type: ignore
+
+
+def backup_dir() -> str:
+    return current_app.config["SCOREBOARD_BACKUP_DIR"] or os.path.join(
+        current_app.instance_path, "backups"
+    )
+
+
+def new_backup_path(compress: bool) -> str:
+    now = datetime.datetime.now(datetime.UTC)
+    name = f"scoreboard-{now:%Y%m%d-%H%M%S}.db"
+    return os.path.join(backup_dir(), name + (COMPRESSED_SUFFIX if compress else ""))
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    # Transactions are managed explicitly.
+    return sqlite3.connect(path, isolation_level=None, timeout=30)
+
+
+def row_counts(connection: sqlite3.Connection) -> dict[str, int]:
+    tables = connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+        " AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'"
+        " ORDER BY name"
+    ).fetchall()
+    return {
+        name: connection.execute(f'SELECT count(*) FROM "{name}"').fetchone()[0]
+        for name, in tables
+    }
+
+
+def integrity_check(connection: sqlite3.Connection) -> str:
+    return "; ".join(row[0] for row in connection.execute("PRAGMA integrity_check"))
+
+
+def backup_database(
+    path: str,
+    pages: int = 100,
+    pause: float = 0.01,
+    verify: bool = True,
+    result: BackupResult | None = None,
+) -> BackupResult:
+    """Back up the database to path, gzip compressed if it ends with .gz."""
+    source_path = database_path()
+    compressed = path.endswith(COMPRESSED_SUFFIX)
+    result = result or BackupResult(name=os.path.basename(path), path=path)
+    result.compressed = compressed
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    partial = path.removesuffix(COMPRESSED_SUFFIX) + ".partial"
+    start = time.perf_counter()
+
+    source = _connect(source_path)
+    target = sqlite3.connect(partial)
+    try:
+        result.journal_mode = source.execute("PRAGMA journal_mode").fetchone()[0]
+        snapshot = result.journal_mode == "wal"
+        if snapshot:
+            # Pin one snapshot for the whole backup, writers are not blocked.
+            source.execute("BEGIN")
+            source.execute("SELECT 1 FROM sqlite_master").fetchall()
+
+        step_start = time.perf_counter()
+        remaining_before = None
+
+        def progress(status, remaining, total):
+            nonlocal step_start, remaining_before
+            step = time.perf_counter() - step_start
+            result.steps += 1
+            result.lock_seconds += step
+            result.max_lock_seconds = max(result.max_lock_seconds, step)
+            result.pages = total
+            if remaining_before is not None and remaining > remaining_before:
+                result.restarts += 1
+            remaining_before = remaining
+            if remaining:
+                time.sleep(pause)
+            step_start = time.perf_counter()
+
+        source.backup(target, pages=pages, progress=progress)
+
+        if verify:
+            result.integrity = integrity_check(target)
+            result.row_counts = row_counts(target)
+            result.verified = result.integrity == "ok" and (
+                not snapshot or result.row_counts == row_counts(source)
+            )
+        if snapshot:
+            source.execute("COMMIT")
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        raise
+    finally:
+        source.close()
+        target.close()
+
+    if compressed:
+        with open(partial, "rb") as file, gzip.open(path, "wb", compresslevel=6) as out:
+            shutil.copyfileobj(file, out, 1024 * 1024)
+        os.remove(partial)
+    else:
+        os.replace(partial, path)
+
+    result.size = os.path.getsize(path)
+    result.duration = time.perf_counter() - start
+    result.status = "ok" if result.verified is not False else "failed"
+    return result
+
+
+def restore_database(path: str, pages: int = 100) -> dict:
+    """Replace the database with a backup, while the app keeps running.
+
+    The backup is checked first. Writers wait while it is copied in, and
+    data versions are increased and change log ids moved past the current
+    ones afterwards, so caches are refreshed and /changes clients resync.
+    """
+    target_path = database_path()
+    with tempfile.TemporaryDirectory() as tmp:
+        if path.endswith(COMPRESSED_SUFFIX):
+            copy = os.path.join(tmp, "restore.db")
+            with gzip.open(path, "rb") as file, open(copy, "wb") as out:
+                shutil.copyfileobj(file, out, 1024 * 1024)
+            path = copy
+
+        source = _connect(path)
+        try:
+            integrity = integrity_check(source)
+            if integrity != "ok":
+                raise ValueError(f"Backup failed integrity check: {integrity}")
+            counts = row_counts(source)
+
+            target = _connect(target_path)
+            try:
+                max_version = target.execute(
+                    "SELECT max(version) FROM data_version"
+                ).fetchone()[0]
+                max_change_id = target.execute(
+                    "SELECT max(id) FROM change_log"
+                ).fetchone()[0]
+
+                # The backup holds the write lock of the database until it is done.
+                start = time.perf_counter()
+                source.backup(target, pages=pages)
+                lock_seconds = time.perf_counter() - start
+
+                target.execute("BEGIN IMMEDIATE")
+                target.execute(
+                    "UPDATE data_version SET version = version + ?",
+                    ((max_version or 0) + 1,),
+                )
+                target.execute(
+                    "UPDATE change_log SET id = id + ?", ((max_change_id or 0) + 1,)
+                )
+                target.execute("COMMIT")
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+    series.clear_cache()
+    return {"integrity": integrity, "row_counts": counts, "lock_seconds": lock_seconds}
+
+
+class BackupJob:
+    """Runs one backup at a time in a background thread of this worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def start(self, compress: bool) -> BackupResult:
+        """Start a backup, raises RuntimeError if one is already running."""
+        app = current_app._get_current_object()  # type: ignore
+        database_path()
+        path = new_backup_path(compress)
+        result = BackupResult(name=os.path.basename(path), path=path)
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                raise RuntimeError("A backup is already running")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            result.write_manifest()
+            self._thread = threading.Thread(
+                target=self._run, args=(app, result), name="backup", daemon=True
+            )
+            self._thread.start()
+        return result
+
+    def _run(self, app: Flask, result: BackupResult):
+        with app.app_context():
+            try:
+                backup_database(
+                    result.path,
+                    pages=int(app.config["SCOREBOARD_BACKUP_PAGES"]),
+                    pause=float(app.config["SCOREBOARD_BACKUP_PAUSE"]),
+                    result=result,
+                )
+            except Exception as ex:
+                app.logger.exception("Backup failed")
+                result.status = "failed"
+                result.error = f"{type(ex).__name__}: {ex}"
+            result.write_manifest()
+
+
+backup_job = BackupJob()
+
+
+def list_backups() -> list[dict]:
+    """Return the manifests of all backups, newest first."""
+    directory = backup_dir()
+    if not os.path.isdir(directory):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name)) as file:
+                manifests.append(json.load(file))
+    return manifests
+
+
+@click.command("backup-database")
+@click.option("--output", help="Backup file, by default a new file in the backup directory.")
+@click.option("--compress", is_flag=True, help="Gzip the backup.")
+@click.option("--no-verify", is_flag=True, help="Skip the integrity check and row counts.")
+@click.option("--pages", type=int, help="Pages copied per step.")
+@with_appcontext
+def backup_database_command(
+    output: str | None, compress: bool, no_verify: bool, pages: int | None
+):
+    """Back up the database while the app is running."""
+    path = output or new_backup_path(compress)
+    if compress and not path.endswith(COMPRESSED_SUFFIX):
+        path += COMPRESSED_SUFFIX
+    try:
+        result = backup_database(
+            path,
+            pages=pages or int(current_app.config["SCOREBOARD_BACKUP_PAGES"]),
+            pause=float(current_app.config["SCOREBOARD_BACKUP_PAUSE"]),
+            verify=not no_verify,
+        )
+    except ValueError as ex:
+        raise click.ClickException(str(ex))
+    result.write_manifest()
+    click.echo(
+        f"Backed up {result.pages} pages to {result.path} ({result.size} bytes) "
+        f"in {result.duration:.2f}s and {result.steps} steps, {result.restarts} restarts."
+    )
+    click.echo(
+        f"Source locked for {result.lock_seconds:.3f}s in total and at most "
+        f"{result.max_lock_seconds:.3f}s at a time ({result.journal_mode} mode)."
+    )
+    if result.verified is not None:
+        click.echo(f"Integrity check: {result.integrity}, row counts: {result.row_counts}")
+        if not result.verified:
+            raise click.ClickException("Backup verification failed.")
+
+
+@click.command("restore-database")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--pages", type=int, help="Pages copied per step.")
+@click.confirmation_option(prompt="This replaces all data in the database. Continue?")
+@with_appcontext
+def restore_database_command(path: str, pages: int | None):
+    """Replace the database with a backup."""
+    try:
+        result = restore_database(
+            path, pages=pages or int(current_app.config["SCOREBOARD_BACKUP_PAGES"])
+        )
+    except ValueError as ex:
+        raise click.ClickException(str(ex))
+    click.echo(f"Restored {path}, row counts: {result['row_counts']}")
+    click.echo(f"Database write lock held for {result['lock_seconds']:.3f}s.")
@@ -0,0 +1,222 @@
+"""Badges, evaluated incrementally as scores are added and deleted.
+
+Every user has a small running state per board, see BadgeState: the total
+score, the total of the current month and the times of the latest awards.
+A new score updates the state of its user in the score's transaction, and
+the badges whose rules became satisfied are awarded, without reading the
+user's history. Monthly badges are awarded to the leaders of a month when
+the first score of the next month is added to the board.
+
+Earned badges are kept when the scores that earned them are deleted.
+backfill-badges rebuilds the states of a board from its history and awards
+the badges earned along the way, by replaying every score in order.
+
+The rules are applied by scoreboard.database when scores are written; apart
+from backfill-badges this module does not access the database.
+"""
+
+import calendar
+import dataclasses
+import datetime
+import json
+from typing import Iterable
+
+import click
+from flask.cli import with_appcontext
+
+from scoreboard.model.badge import BadgeState
+
+# (user id, badge, time) of a badge to award.
+Award = tuple[int, str, datetime.datetime]
+
+
+@dataclasses.dataclass(frozen=True)
+class Rule:
+    name: str
+    title: str
+    description: str
+
+
+@dataclasses.dataclass(frozen=True)
+class TotalRule(Rule):
+    """Reach a total score."""
+
+    points: int
+
+    def satisfied(self, state: BadgeState) -> bool:
+        return state.total >= self.points
+
+
+@dataclasses.dataclass(frozen=True)
+class WindowRule(Rule):
+    """Get count awards, scores above zero, within a time window."""
+
+    count: int
+    window: datetime.timedelta
+
+    def satisfied(self, state: BadgeState) -> bool:
+        times = recent_times(state)
+        return len(times) >= self.count and times[-1] - times[-self.count] <= self.window
+
+
+@dataclasses.dataclass(frozen=True)
+class MonthlyTopRule(Rule):
+    """End a month among the places highest totals of that month on the board."""
+
+    places: int
+
+
+RULES: tuple[Rule, ...] = (
+    TotalRule("points_1000", "Tusenklubben", "Nå 1000 poäng.", points=1000),
+    WindowRule(
+        "week_10",
+        "Flitig vecka",
+        "Få poäng tio gånger inom en vecka.",
+        count=10,
+        window=datetime.timedelta(days=7),
+    ),
+    MonthlyTopRule(
+        "month_top_3", "Pallplats", "Sluta bland de tre bästa under en månad.", places=3
+    ),
+)
+RULES_BY_NAME = {rule.name: rule for rule in RULES}
+
+_STATE_RULES = [rule for rule in RULES if isinstance(rule, (TotalRule, WindowRule))]
+_MONTHLY_RULES = [rule for rule in RULES if isinstance(rule, MonthlyTopRule)]
+
+# Award times kept in a state, enough for every window rule.
+RECENT_AWARDS = max(
+    (rule.count for rule in RULES if isinstance(rule, WindowRule)), default=0
+)
+# Leaders of a month read when it ends, enough for every monthly rule.
+MONTH_PLACES = max((rule.places for rule in _MONTHLY_RULES), default=0)
+
+
+def new_state(board_id: int, user_id: int) -> BadgeState:
+    return BadgeState(
+        boardId=board_id, userId=user_id, total=0, month=None, monthTotal=0, recent="[]"
+    )  # type: ignore
+
+
+def month_of(time: datetime.datetime) -> str:
+    return f"{time:%Y-%m}"
+
+
+def month_end(month: str) -> datetime.datetime:
+    """Return the start of the month after month, when its badges are awarded."""
+    year, number = map(int, month.split("-"))
+    days = calendar.monthrange(year, number)[1]
+    return datetime.datetime(year, number, 1) + datetime.timedelta(days=days)
+
+
+def recent_times(state: BadgeState) -> list[datetime.datetime]:
+    return [datetime.datetime.fromisoformat(time) for time in json.loads(state.recent)]
+
+
+def _satisfied(state: BadgeState) -> set[str]:
+    return {rule.name for rule in _STATE_RULES if rule.satisfied(state)}
+
+
+def add_score(state: BadgeState, time: datetime.datetime, score: int) -> list[str]:
+    """Apply a new score to its user's state and return the badges it earns."""
+    before = _satisfied(state)
+    month = month_of(time)
+    if state.month is None or month > state.month:
+        state.month = month
+        state.monthTotal = 0
+    state.total += score
+    if month == state.month:
+        state.monthTotal += score
+    if score > 0 and RECENT_AWARDS:
+        times = json.loads(state.recent) + [time.isoformat()]
+        state.recent = json.dumps(sorted(times)[-RECENT_AWARDS:])
+    return sorted(_satisfied(state) - before)
+
+
+def remove_score(
+    state: BadgeState,
+    time: datetime.datetime,
+    score: int,
+    recent: list[datetime.datetime] | None,
+) -> list[str]:
+    """Take a deleted score out of its user's state and return the badges earned.
+
+    recent are the times of the user's latest remaining awards, oldest first,
+    if the deleted score was an award.
+    """
+    before = _satisfied(state)
+    state.total -= score
+    if month_of(time) == state.month:
+        state.monthTotal -= score
+    if recent is not None:
+        state.recent = json.dumps([time.isoformat() for time in recent[-RECENT_AWARDS:]])
+    return sorted(_satisfied(state) - before)
+
+
+def month_awards(month: str, leader_ids: list[int]) -> list[Award]:
+    """Return the badges of the leaders of an ended month, best first."""
+    time = month_end(month)
+    return [
+        (user_id, rule.name, time)
+        for rule in _MONTHLY_RULES
+        for user_id in leader_ids[: rule.places]
+    ]
+
+
+def month_leaders(states: Iterable[BadgeState], month: str) -> list[int]:
+    """Return the users with the highest positive totals of a month, best first.
+
+    Ties go to the lowest user id, like in scoreboard.database.
+    """
+    leaders = sorted(
+        (state for state in states if state.month == month and state.monthTotal > 0),
+        key=lambda state: (-state.monthTotal, state.userId),
+    )
+    return [state.userId for state in leaders[:MONTH_PLACES]]
+
+
+def replay(
+    board_id: int, scores: Iterable[tuple[int, datetime.datetime, int]]
+) -> tuple[dict[int, BadgeState], list[Award]]:
+    """Build the states of a board from its (userId, time, score) rows in time order.
+
+    Returns the state of every user and the badges earned along the way.
+    """
+    states: dict[int, BadgeState] = {}
+    awards: list[Award] = []
+    month = None
+    for user_id, time, score in scores:
+        if month is not None and month_of(time) != month:
+            awards += month_awards(month, month_leaders(states.values(), month))
+        month = month_of(time)
+        state = states.get(user_id)
+        if state is None:
+            state = states[user_id] = new_state(board_id, user_id)
+        awards += [(user_id, name, time) for name in add_score(state, time, score)]
+    return states, awards
+
+
+@click.command("backfill-badges")
+@click.option(
+    "--board",
+    "board_ids",
+    type=int,
+    multiple=True,
+    help="Board to backfill, can be repeated. All boards by default.",
+)
+@with_appcontext
+def backfill_badges_command(board_ids: tuple[int, ...]):
+    """Rebuild the badge states from the score history and award earned badges."""
+    # Imported here, since the database module applies the rules above.
+    from scoreboard import database
+
+    boards = {board.id for board in database.get_boards()}
+    unknown = set(board_ids) - boards
+    if unknown:
+        raise click.ClickException(f"No board with id {min(unknown)}.")
+    for board_id in board_ids or sorted(boards):
+        users, awarded = database.backfill_badges(board_id)
+        click.echo(
+            f"Rebuilt the badge state of {users} users of board {board_id}, "
+            f"awarded {awarded} new badges."
+        )
@@ -0,0 +1,58 @@
+import datetime
+import json
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from scoreboard import database
+
+def get_feed(since: int, limit: int) -> dict:
+    """Return the changes after the cursor since, or a resync signal if they were compacted."""
+    first_id, last_id = database.get_change_bounds()
+    # Compaction always keeps the newest change, so a cursor past it comes
+    # from before the database was restored from a backup.
+    if (first_id is not None and since < first_id - 1) or since > (last_id or 0):
+        return {
+            "changes": [],
+            "cursor": last_id,
+            "has_more": False,
+            "resync_required": True,
+        }
+
+    changes = database.get_changes(since, limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return {
+        "changes": [
+            {
+                "id": change.id,
+                "time": change.time,
+                "entity": change.entity,
+                "entity_id": change.entityId,
+                "operation": change.operation,
+                "data": json.loads(change.payload) if change.payload else None,
+            }
+            for change in changes
+        ],
+        "cursor": changes[-1].id if changes else max(since, last_id or 0),
+        "has_more": has_more,
+        "resync_required": False,
+    }
+
+
+def compact() -> int:
+    retention = datetime.timedelta(
+        seconds=int(current_app.config["SCOREBOARD_CHANGES_RETENTION"])
+    )
+    before = datetime.datetime.now(datetime.UTC).replace(tzinfo=None) - retention
+    return database.compact_changes(
+        before, int(current_app.config["SCOREBOARD_CHANGES_MAX_ROWS"])
+    )
+
+
+@click.command("compact-changes")
+@with_appcontext
+def compact_changes_command():
+    """Delete change log entries beyond the retention limits."""
+    click.echo(f"Deleted {compact()} changes.")
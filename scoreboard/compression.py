@@ -0,0 +1,161 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+from flask import Flask, Response, current_app, g, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/html", "text/plain", "text/css")
+CACHE_SIZE = 32
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=5)  # type: ignore
+    return gzip.compress(data, compresslevel=6)
+
+
+class CompressionStats:
+    """Per-worker counters of what compression has cost and saved.
+
+    A response served from the compression cache saves the CPU time that
+    compressing its body took when it was cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.cache_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+        self.cpu_seconds_saved = 0.0
+
+    def add(self, bytes_in: int, bytes_out: int, cpu_seconds: float, cache_hit: bool):
+        with self._lock:
+            self.responses += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            if cache_hit:
+                self.cache_hits += 1
+                self.cpu_seconds_saved += cpu_seconds
+            else:
+                self.cpu_seconds += cpu_seconds
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "cache_hits": self.cache_hits,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+                "cpu_seconds": self.cpu_seconds,
+                "cpu_seconds_saved": self.cpu_seconds_saved,
+            }
+
+
+stats = CompressionStats()
+
+# Compressed bodies and the CPU seconds compressing them took, by (cache key,
+# encoding), for responses that a view has marked with g.compression_cache_key,
+# e.g. the versioned leaderboard.
+_cache: OrderedDict[tuple[Hashable, str], tuple[bytes, float]] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _timed_compress(data: bytes, encoding: str) -> tuple[bytes, float]:
+    start = time.thread_time()
+    body = compress(data, encoding)
+    return body, time.thread_time() - start
+
+
+def _cached_compress(
+    key: Hashable | None, data: bytes, encoding: str
+) -> tuple[bytes, float, bool]:
+    """Return the compressed body, the CPU seconds compressing it took and whether it was cached."""
+    if key is None:
+        return *_timed_compress(data, encoding), False
+    with _cache_lock:
+        cached = _cache.get((key, encoding))
+        if cached is not None:
+            _cache.move_to_end((key, encoding))
+            return *cached, True
+    body, cpu_seconds = _timed_compress(data, encoding)
+    with _cache_lock:
+        _cache[(key, encoding)] = (body, cpu_seconds)
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return body, cpu_seconds, False
+
+
+def compress_response(response: Response) -> Response:
+    if (
+        request.method == "HEAD"
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < int(current_app.config["SCOREBOARD_COMPRESSION_MIN_SIZE"]):
+        return response
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    body, cpu_seconds, cache_hit = _cached_compress(
+        g.get("compression_cache_key"), data, encoding
+    )
+    stats.add(len(data), len(body), cpu_seconds, cache_hit)
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+class PrebuiltSpec:
+    """The API's Swagger spec, serialized and compressed once at startup."""
+
+    def __init__(self, schema: dict):
+        body = json.dumps(schema, separators=(",", ":")).encode()
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {None: body}
+        self.variants.update((encoding, compress(body, encoding)) for encoding in ENCODINGS)
+
+    def view(self) -> Response:
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        etag = self.etag if encoding is None else f"{self.etag}-{encoding}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.variants[encoding], mimetype="application/json")
+            if encoding is not None:
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+        return response
+
+
+def init_app(app: Flask, api):
+    """Serve a prebuilt spec and compress large responses."""
+    with app.test_request_context():
+        schema = api.__schema__
+    if "error" not in schema:
+        app.view_functions["specs"] = PrebuiltSpec(schema).view
+    app.after_request(compress_response)
@@ -1,12 +1,43 @@
 import datetime
-from typing import Sequence
-
-from sqlalchemy import exc
-
-from scoreboard import db
-from scoreboard.enums import ClearanceEnum
+import json
+from typing import Any, Sequence
+
+from sqlalchemy import and_, exc, literal_column, or_, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload
+
+from scoreboard import badges, db
+from scoreboard.enums import (
+    ChangeEntityEnum,
+    ChangeOperationEnum,
+    ClearanceEnum,
+    DataVersionEnum,
+)
+from scoreboard.model.badge import BadgeState, UserBadge
+from scoreboard.model.board import Board
+from scoreboard.model.change import ChangeLog
 from scoreboard.model.user import User
 from scoreboard.model.scores import ScoreLog
+from scoreboard.model.snapshot import LeaderboardSnapshot
+from scoreboard.model.version import DataVersion
+from scoreboard.model.webhook import Webhook
+from scoreboard.util import decode_cursor, encode_cursor
+
+USER_SORT_COLUMNS = {
+    "name": User.name,
+    "last_login": User.lastLogin,
+    "role": User.userTypeId,
+}
+
+# Types of the sort value in a user cursor, None where the column is nullable.
+_USER_CURSOR_VALUE_TYPES = {
+    "name": str,
+    "last_login": (str, type(None)),
+    "role": int,
+}
+
+# Upper bound for prefix ranges, sorts after every other code point.
+_PREFIX_END = "\U0010ffff"
 
 
 def commit():
@@ -17,13 +48,269 @@ def rollback():
     db.session.rollback()
 
 
+def data_version_name(name: DataVersionEnum, board_id: int | None = None) -> str:
+    """Scores versions are kept per board, so a write leaves the caches of other boards alone."""
+    return name.value if board_id is None else f"{name.value}:{board_id}"
+
+
+def get_data_version(name: DataVersionEnum, board_id: int | None = None) -> int:
+    version = db.session.execute(
+        db.select(DataVersion.version).filter_by(
+            name=data_version_name(name, board_id)
+        )
+    ).scalar()
+    return version or 0
+
+
+def bump_data_version(name: DataVersionEnum, board_id: int | None = None):
+    """Increment a data version in the current transaction; committed by the caller."""
+    db.session.execute(
+        db.update(DataVersion)
+        .filter_by(name=data_version_name(name, board_id))
+        .values(version=DataVersion.version + 1)
+    )
+
+
+def record_change(
+    entity: ChangeEntityEnum,
+    operation: ChangeOperationEnum,
+    entity_id: int,
+    payload: dict | None = None,
+):
+    """Add a change log entry in the current transaction; committed by the caller.
+
+    SQLite holds its write lock until commit, so entry ids follow commit order.
+    """
+    db.session.add(ChangeLog(**_change_values(entity, operation, entity_id, payload)))
+
+
+def _change_values(
+    entity: ChangeEntityEnum,
+    operation: ChangeOperationEnum,
+    entity_id: int,
+    payload: dict | None = None,
+) -> dict:
+    return {
+        "entity": entity.value,
+        "entityId": entity_id,
+        "operation": operation.value,
+        "payload": json.dumps(payload, default=str) if payload is not None else None,
+    }
+
+
+def _score_payload(score: ScoreLog) -> dict:
+    return {
+        "id": score.id,
+        "boardId": score.boardId,
+        "time": score.time.isoformat(),
+        "userId": score.userId,
+        "addedById": score.addedById,
+        "score": score.score,
+        "description": score.description,
+    }
+
+
+def _user_payload(user: User) -> dict:
+    return {"id": user.id, "name": user.name}
+
+
+def get_changes(after_id: int, limit: int) -> Sequence[ChangeLog]:
+    return (
+        db.session.execute(
+            db.select(ChangeLog)
+            .where(ChangeLog.id > after_id)
+            .order_by(ChangeLog.id)
+            .limit(limit)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def get_change_bounds() -> tuple[int | None, int | None]:
+    """Return the lowest and highest change log ids."""
+    # Separate subqueries, so each bound is read from one end of the table.
+    return db.session.execute(
+        db.select(
+            db.select(db.func.min(ChangeLog.id)).scalar_subquery(),
+            db.select(db.func.max(ChangeLog.id)).scalar_subquery(),
+        )
+    ).one()  # type: ignore
+
+
+def compact_changes(before: datetime.datetime, max_rows: int) -> int:
+    """Delete changes older than before, or beyond the newest max_rows.
+
+    The newest change is always kept, so the lowest id marks how far the log
+    has been compacted.
+    """
+    _, last_id = get_change_bounds()
+    if last_id is None:
+        return 0
+    result = db.session.execute(
+        db.delete(ChangeLog).where(
+            ChangeLog.id < last_id,
+            or_(ChangeLog.time < before, ChangeLog.id <= last_id - max_rows),
+        )
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def get_board(id: int) -> Board | None:
+    return db.session.get(Board, id)
+
+
+def get_boards() -> Sequence[Board]:
+    return db.session.execute(db.select(Board).order_by(Board.id)).scalars().all()
+
+
+def add_board(board: Board) -> bool:
+    try:
+        db.session.add(board)
+        db.session.flush()
+        db.session.add(
+            DataVersion(
+                name=data_version_name(DataVersionEnum.Scores, board.id), version=0
+            )
+        )
+        db.session.commit()
+        return True
+    except exc.SQLAlchemyError:
+        db.session.rollback()
+        return False
+
+
+def get_webhooks() -> Sequence[Webhook]:
+    return db.session.execute(db.select(Webhook).order_by(Webhook.id)).scalars().all()
+
+
+def add_webhook(webhook: Webhook) -> bool:
+    try:
+        db.session.add(webhook)
+        db.session.commit()
+        return True
+    except exc.SQLAlchemyError:
+        db.session.rollback()
+        return False
+
+
+def delete_webhook(id: int) -> bool:
+    webhook = db.session.get(Webhook, id)
+    if not webhook:
+        return False
+    db.session.delete(webhook)
+    db.session.commit()
+    return True
+
+
 def get_user(id: int) -> User | None:
     return db.session.get(User, id)
 
 
-def get_users() -> Sequence[User]:
-    users = db.session.execute(db.select(User).where(User.id > 0)).scalars().all()
-    return users
+def get_users_page(
+    search: str | None = None,
+    sort: str = "name",
+    descending: bool = False,
+    cursor: str | None = None,
+    limit: int = 50,
+) -> tuple[Sequence[User], str | None]:
+    """Return one keyset-paginated page of users and the cursor of the next page.
+
+    Raises ValueError if the cursor is malformed or was issued for another sort.
+    """
+    column = USER_SORT_COLUMNS[sort]
+    order = (column.desc(), User.id.desc()) if descending else (column, User.id)
+    query = (
+        db.select(User)
+        .options(joinedload(User.userType))
+        .where(User.id > 0)
+        .order_by(*order)
+    )
+
+    if search:
+        email_prefix = search.lower()
+        query = query.where(
+            or_(
+                and_(User.name >= search, User.name < search + _PREFIX_END),
+                and_(
+                    db.func.lower(User.email) >= email_prefix,
+                    db.func.lower(User.email) < email_prefix + _PREFIX_END,
+                ),
+            )
+        )
+
+    after = None
+    if cursor:
+        cursor_sort, value, last_id = _decode_user_cursor(cursor)
+        if cursor_sort != sort:
+            raise ValueError("Cursor does not match sort order")
+        after = (value, last_id)
+
+    users: list[User] = []
+    for condition in _user_page_ranges(column, after, descending):
+        users += (
+            db.session.execute(query.where(condition).limit(limit + 1 - len(users)))
+            .scalars()
+            .all()
+        )
+        if len(users) > limit:
+            break
+    if len(users) <= limit:
+        return users, None
+
+    users = users[:limit]
+    last = users[-1]
+    value = getattr(last, column.key)
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    return users, encode_cursor([sort, value, last.id])
+
+
+def _decode_user_cursor(cursor: str) -> tuple[str, Any, int]:
+    values = decode_cursor(cursor)
+    if len(values) != 3:
+        raise ValueError("Invalid cursor")
+    sort, value, last_id = values
+    if (
+        not isinstance(sort, str)
+        or not isinstance(value, _USER_CURSOR_VALUE_TYPES.get(sort, ()))
+        or type(last_id) is not int
+    ):
+        raise ValueError("Invalid cursor")
+    if sort == "last_login" and value is not None:
+        value = datetime.datetime.fromisoformat(value)
+    return sort, value, last_id
+
+
+def _user_page_ranges(column, after: tuple[Any, int] | None, descending: bool) -> list:
+    """Return the conditions of the index ranges a page of users is read from, in order.
+
+    Each condition is a search in the sort column's index, starting after the
+    (value, id) of the previous page, so pages never scan the index from its
+    start. SQLite sorts NULL first in ascending order and last in descending
+    order, and users without a value are a range of their own.
+    """
+    if after is None:
+        # Starts at the lowest value, a bound SQLite can search the index from.
+        values = column >= db.select(db.func.min(column)).scalar_subquery()
+        nulls = column.is_(None)
+    else:
+        value, last_id = after
+        if value is None:
+            values = None if descending else column.is_not(None)
+            after_id = User.id < last_id if descending else User.id > last_id
+            nulls = and_(column.is_(None), after_id)
+        elif descending:
+            values = tuple_(column, User.id) < (value, last_id)
+            nulls = column.is_(None)
+        else:
+            values = tuple_(column, User.id) > (value, last_id)
+            nulls = None
+    if not column.expression.nullable:
+        nulls = None
+    ranges = [values, nulls] if descending else [nulls, values]
+    return [condition for condition in ranges if condition is not None]
 
 
 def get_user_by_email(email: str) -> User | None:
@@ -49,9 +336,88 @@ def update_user_password(id: int, hashed_password: str) -> bool:
     return True
 
 
+def get_score_recipients() -> Sequence[tuple[int, str, str]]:
+    return db.session.execute(
+        db.select(User.id, User.name, User.email).where(
+            User.id > 0, User.userTypeId.op("&")(ClearanceEnum.Wannabe.value) != 0
+        )
+    ).all()
+
+
 def add_user(user: User) -> bool:
     try:
         db.session.add(user)
+        db.session.flush()
+        record_change(
+            ChangeEntityEnum.User,
+            ChangeOperationEnum.Insert,
+            user.id,
+            _user_payload(user),
+        )
+        bump_data_version(DataVersionEnum.Users)
+        db.session.commit()
+        return True
+    except exc.SQLAlchemyError:
+        db.session.rollback()
+        return False
+
+
+def get_existing_emails(emails: Sequence[str]) -> set[str]:
+    """Return the lowercased emails out of the given ones that already belong to a user."""
+    lowered = {email.lower() for email in emails}
+    if not lowered:
+        return set()
+    return set(
+        db.session.execute(
+            db.select(db.func.lower(User.email)).where(
+                db.func.lower(User.email).in_(lowered)
+            )
+        ).scalars()
+    )
+
+
+def add_users(users: Sequence[User]) -> bool:
+    """Insert new users with a fixed number of statements, and set their ids.
+
+    The users are not added to the session.
+    """
+    if not users:
+        return True
+    try:
+        db.session.execute(
+            db.insert(User),
+            [
+                {
+                    "email": user.email,
+                    "name": user.name,
+                    "password": user.password,
+                    "userTypeId": user.userTypeId,
+                }
+                for user in users
+            ],
+        )
+        ids = dict(
+            db.session.execute(
+                db.select(User.email, User.id).where(
+                    User.email.in_([user.email for user in users])
+                )
+            ).all()
+        )
+        for user in users:
+            user.id = ids[user.email]
+        db.session.execute(
+            db.insert(ChangeLog),
+            [
+                _change_values(
+                    ChangeEntityEnum.User,
+                    ChangeOperationEnum.Insert,
+                    user.id,
+                    _user_payload(user),
+                )
+                for user in users
+            ],
+        )
+        bump_data_version(DataVersionEnum.Users)
         db.session.commit()
         return True
     except exc.SQLAlchemyError:
@@ -66,6 +432,11 @@ def update_user(id: int, name: str, email: str) -> bool:
     user.name = name
     user.email = email
     try:
+        # The version bump flushes the email, which may already be taken.
+        record_change(
+            ChangeEntityEnum.User, ChangeOperationEnum.Update, id, _user_payload(user)
+        )
+        bump_data_version(DataVersionEnum.Users)
         db.session.commit()
     except exc.IntegrityError:
         db.session.rollback()
@@ -84,21 +455,48 @@ def reset_user_password(id: int, hashed_temp_password: str) -> bool:
 
 
 def add_user_role(id: int, new_role: ClearanceEnum) -> bool:
-    user = db.session.get(User, id)
-    if not user:
-        return False
-    user.userTypeId = user.userTypeId | new_role
-    db.session.commit()
-    return True
+    return _update_user_roles([id], User.userTypeId.op("|")(new_role.value)) > 0
 
 
 def remove_user_role(id: int, role: ClearanceEnum) -> bool:
-    user = db.session.get(User, id)
-    if not user:
-        return False
-    user.userTypeId = user.userTypeId & ~role
+    return _update_user_roles([id], User.userTypeId.op("&")((~role).value)) > 0
+
+
+def add_users_role(ids: Sequence[int], new_role: ClearanceEnum) -> Sequence[User]:
+    _update_user_roles(ids, User.userTypeId.op("|")(new_role.value))
+    return get_users_by_ids(ids)
+
+
+def remove_users_role(ids: Sequence[int], role: ClearanceEnum) -> Sequence[User]:
+    _update_user_roles(ids, User.userTypeId.op("&")((~role).value))
+    return get_users_by_ids(ids)
+
+
+def _update_user_roles(ids: Sequence[int], user_type_id) -> int:
+    """Apply a role change to all given users in one atomic UPDATE."""
+    result = db.session.execute(
+        db.update(User)
+        .where(User.id.in_(ids), User.id > 0)
+        .values(userTypeId=user_type_id)
+        .execution_options(synchronize_session="fetch")
+    )
+    if result.rowcount:
+        bump_data_version(DataVersionEnum.Users)
     db.session.commit()
-    return True
+    return result.rowcount
+
+
+def get_users_by_ids(ids: Sequence[int]) -> Sequence[User]:
+    return (
+        db.session.execute(
+            db.select(User)
+            .options(joinedload(User.userType))
+            .where(User.id.in_(ids), User.id > 0)
+            .order_by(User.id)
+        )
+        .scalars()
+        .all()
+    )
 
 
 def delete_user(id: int) -> bool:
@@ -108,7 +506,18 @@ def delete_user(id: int) -> bool:
     db.session.execute(
         db.update(ScoreLog).where(ScoreLog.addedById == user.id).values(addedById=0)
     )
+    db.session.execute(db.delete(BadgeState).where(BadgeState.userId == user.id))
+    db.session.execute(db.delete(UserBadge).where(UserBadge.userId == user.id))
     db.session.delete(user)
+    # Clients reassign the scores added by the user to user 0 themselves.
+    record_change(ChangeEntityEnum.User, ChangeOperationEnum.Delete, id)
+    bump_data_version(DataVersionEnum.Users)
+    # The user's scores may be on any board.
+    db.session.execute(
+        db.update(DataVersion)
+        .where(DataVersion.name.startswith(f"{DataVersionEnum.Scores.value}:"))
+        .values(version=DataVersion.version + 1)
+    )
     db.session.commit()
     return True
 
@@ -120,6 +529,15 @@ def get_score(id: int) -> ScoreLog | None:
 def add_score(score: ScoreLog) -> bool:
     try:
         db.session.add(score)
+        db.session.flush()
+        record_change(
+            ChangeEntityEnum.Score,
+            ChangeOperationEnum.Insert,
+            score.id,
+            _score_payload(score),
+        )
+        _add_to_badges(score)
+        bump_data_version(DataVersionEnum.Scores, score.boardId)
         db.session.commit()
         return True
     except exc.SQLAlchemyError:
@@ -127,10 +545,13 @@ def add_score(score: ScoreLog) -> bool:
         return False
 
 
-def get_user_scores(user_id: int) -> Sequence[ScoreLog]:
+def get_user_scores(board_id: int, user_id: int) -> Sequence[ScoreLog]:
     scores = (
         db.session.execute(
-            db.select(ScoreLog).filter_by(userId=user_id).order_by(ScoreLog.time.desc())
+            db.select(ScoreLog)
+            .options(joinedload(ScoreLog.user), joinedload(ScoreLog.addedBy))
+            .filter_by(boardId=board_id, userId=user_id)
+            .order_by(ScoreLog.time.desc())
         )
         .scalars()
         .all()
@@ -138,21 +559,142 @@ def get_user_scores(user_id: int) -> Sequence[ScoreLog]:
     return scores
 
 
-def get_scores_aggregated() -> Sequence[ScoreLog]:
-    scores = db.session.execute(
-        db.select(ScoreLog.userId, db.func.sum(ScoreLog.score).label("score"))
+def get_score_columns(
+    board_id: int, user_id: int | None = None
+) -> Sequence[tuple[int, datetime.datetime, int, int]]:
+    """Return (userId, time, score, addedById) rows ordered by user and time."""
+    query = (
+        db.select(ScoreLog.userId, ScoreLog.time, ScoreLog.score, ScoreLog.addedById)
+        .filter_by(boardId=board_id)
+        .order_by(ScoreLog.userId, ScoreLog.time, ScoreLog.id)
+    )
+    if user_id is not None:
+        query = query.filter_by(userId=user_id)
+    return db.session.execute(query).all()
+
+
+def get_top_user_ids(board_id: int, limit: int) -> list[int]:
+    return list(
+        db.session.execute(
+            db.select(ScoreLog.userId)
+            .filter_by(boardId=board_id)
+            .group_by(ScoreLog.userId)
+            .order_by(db.func.sum(ScoreLog.score).desc())
+            .limit(limit)
+        ).scalars()
+    )
+
+
+def get_score_summaries(
+    board_id: int, user_ids: Sequence[int]
+) -> dict[int, tuple[int, int]]:
+    """Return the number of scores and the total score of each user."""
+    rows = db.session.execute(
+        db.select(ScoreLog.userId, db.func.count(), db.func.sum(ScoreLog.score))
+        .where(ScoreLog.boardId == board_id, ScoreLog.userId.in_(user_ids))
         .group_by(ScoreLog.userId)
-        .order_by(db.func.sum(ScoreLog.score).desc())
     ).all()
-    scores_dict = []
-    for score in scores:
-        score_dict = {
-            "score": score.score,
-            "user": get_user(score.userId),
-        }
-        scores_dict.append(score_dict)
-    print(scores_dict)
-    return scores_dict
+    return {user_id: (count, total) for user_id, count, total in rows}
+
+
+def get_scores_after(
+    board_id: int, user_ids: Sequence[int], after_id: int
+) -> Sequence[tuple[int, int, datetime.datetime, int]]:
+    """Return (userId, id, time, score) rows newer than after_id, ordered by user and time."""
+    return db.session.execute(
+        db.select(ScoreLog.userId, ScoreLog.id, ScoreLog.time, ScoreLog.score)
+        .where(
+            ScoreLog.boardId == board_id,
+            ScoreLog.userId.in_(user_ids),
+            ScoreLog.id > after_id,
+        )
+        .order_by(ScoreLog.userId, ScoreLog.time, ScoreLog.id)
+    ).all()
+
+
+def get_running_totals(
+    board_id: int, user_ids: Sequence[int]
+) -> Sequence[tuple[int, int, datetime.datetime, int]]:
+    """Return (userId, id, time, running total) rows, ordered by user and time."""
+    running_total = db.func.sum(ScoreLog.score).over(
+        partition_by=ScoreLog.userId, order_by=(ScoreLog.time, ScoreLog.id)
+    )
+    return db.session.execute(
+        db.select(ScoreLog.userId, ScoreLog.id, ScoreLog.time, running_total)
+        .where(ScoreLog.boardId == board_id, ScoreLog.userId.in_(user_ids))
+        .order_by(ScoreLog.userId, ScoreLog.time, ScoreLog.id)
+    ).all()
+
+
+def get_user_names(ids: Sequence[int]) -> dict[int, str]:
+    if not ids:
+        return {}
+    return dict(
+        db.session.execute(
+            db.select(User.id, User.name).where(User.id.in_(ids))
+        ).all()
+    )
+
+
+_score_log_fts = db.table("score_log_fts", db.column("rowid"))
+
+
+def search_scores(
+    board_id: int,
+    match: str,
+    user_id: int | None = None,
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+    offset: int = 0,
+    limit: int = 20,
+) -> Sequence[tuple[ScoreLog, str]]:
+    """Return scores whose description matches an FTS5 query, best match first.
+
+    Each score comes with a snippet of its description with the matches
+    marked. Raises sqlalchemy.exc.OperationalError on invalid queries.
+    """
+    # FTS5 functions and MATCH take the table name as their first operand.
+    fts = literal_column("score_log_fts")
+    # The index holds every board, so the board is matched in the index as
+    # well, and the query only in descriptions. The board id column does not
+    # count towards the rank.
+    board_match = f'boardId : "{board_id}" AND description : ({match})'
+    query = (
+        db.select(ScoreLog, db.func.snippet(fts, 0, "[", "]", "…", 12))
+        .join(_score_log_fts, _score_log_fts.c.rowid == ScoreLog.id)
+        .options(joinedload(ScoreLog.user), joinedload(ScoreLog.addedBy))
+        .where(fts.op("MATCH")(board_match), ScoreLog.boardId == board_id)
+        .order_by(db.func.bm25(fts, 1.0, 0.0), ScoreLog.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    if user_id is not None:
+        query = query.where(ScoreLog.userId == user_id)
+    if start is not None:
+        query = query.where(ScoreLog.time >= start)
+    if end is not None:
+        query = query.where(ScoreLog.time < end)
+    return db.session.execute(query).all()
+
+
+def rebuild_search_index():
+    db.session.execute(
+        db.text("INSERT INTO score_log_fts(score_log_fts) VALUES ('rebuild')")
+    )
+    db.session.commit()
+
+
+def get_scores_aggregated(board_id: int) -> Sequence[dict]:
+    total = db.func.sum(ScoreLog.score).label("score")
+    rows = db.session.execute(
+        db.select(User, total)
+        .select_from(ScoreLog)
+        .outerjoin(User, User.id == ScoreLog.userId)
+        .where(ScoreLog.boardId == board_id)
+        .group_by(ScoreLog.userId)
+        .order_by(total.desc())
+    ).all()
+    return [{"score": score, "user": user} for user, score in rows]
 
 
 def delete_score(id: int) -> bool:
@@ -160,5 +702,254 @@ def delete_score(id: int) -> bool:
     if not score:
         return False
     db.session.delete(score)
+    _remove_from_badges(score)
+    db.session.execute(
+        db.delete(LeaderboardSnapshot).where(
+            LeaderboardSnapshot.boardId == score.boardId,
+            LeaderboardSnapshot.lastScoreId >= id,
+        )
+    )
+    record_change(
+        ChangeEntityEnum.Score,
+        ChangeOperationEnum.Delete,
+        id,
+        {"id": id, "boardId": score.boardId},
+    )
+    bump_data_version(DataVersionEnum.Scores, score.boardId)
     db.session.commit()
     return True
+
+
+def _add_to_badges(score: ScoreLog):
+    """Update the badge state of the score's user and award the badges it earns.
+
+    Runs after the score's insert, so the database write lock is held.
+    """
+    state = get_badge_state(score.boardId, score.userId)
+    if state is None:
+        # Added last, so it is inserted once with its values.
+        state = badges.new_state(score.boardId, score.userId)
+    awards = []
+    month = badges.month_of(score.time)
+    if (state.month is None or month > state.month) and not is_badge_month_started(
+        score.boardId, month
+    ):
+        # The first score of a month on the board ends the previous month.
+        previous, leader_ids = get_previous_month_leaders(
+            score.boardId, month, badges.MONTH_PLACES
+        )
+        if previous is not None:
+            awards += badges.month_awards(previous, leader_ids)
+    awards += [
+        (score.userId, name, score.time)
+        for name in badges.add_score(state, score.time, score.score)
+    ]
+    db.session.add(state)
+    add_user_badges(score.boardId, awards)
+
+
+def _remove_from_badges(score: ScoreLog):
+    """Take a deleted score out of the badge state of its user."""
+    state = get_badge_state(score.boardId, score.userId)
+    if state is None:
+        return
+    recent = None
+    if score.score > 0:
+        recent = get_recent_award_times(
+            score.boardId, score.userId, badges.RECENT_AWARDS
+        )
+    earned = badges.remove_score(state, score.time, score.score, recent)
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    add_user_badges(score.boardId, [(score.userId, name, now) for name in earned])
+
+
+def get_badge_state(board_id: int, user_id: int) -> BadgeState | None:
+    return db.session.get(BadgeState, (board_id, user_id))
+
+
+def is_badge_month_started(board_id: int, month: str) -> bool:
+    """Return whether a user already has a score of month on the board."""
+    return (
+        db.session.execute(
+            db.select(BadgeState.userId).filter_by(boardId=board_id, month=month).limit(1)
+        ).first()
+        is not None
+    )
+
+
+def get_previous_month_leaders(
+    board_id: int, month: str, limit: int
+) -> tuple[str | None, list[int]]:
+    """Return the latest month before month with scores on the board, and its leaders.
+
+    The leaders are the users with the highest positive totals of that month,
+    best first and ties to the lowest user id.
+    """
+    previous = (
+        db.select(db.func.max(BadgeState.month))
+        .where(BadgeState.boardId == board_id, BadgeState.month < month)
+        .scalar_subquery()
+    )
+    rows = db.session.execute(
+        db.select(BadgeState.month, BadgeState.userId)
+        .where(
+            BadgeState.boardId == board_id,
+            BadgeState.month == previous,
+            BadgeState.monthTotal > 0,
+        )
+        .order_by(BadgeState.monthTotal.desc(), BadgeState.userId)
+        .limit(limit)
+    ).all()
+    if not rows:
+        return None, []
+    return rows[0][0], [user_id for _, user_id in rows]
+
+
+def get_recent_award_times(
+    board_id: int, user_id: int, limit: int
+) -> list[datetime.datetime]:
+    """Return the times of the user's latest scores above zero, oldest first."""
+    times = db.session.execute(
+        db.select(ScoreLog.time)
+        .where(
+            ScoreLog.boardId == board_id,
+            ScoreLog.userId == user_id,
+            ScoreLog.score > 0,
+        )
+        .order_by(ScoreLog.time.desc(), ScoreLog.id.desc())
+        .limit(limit)
+    ).scalars()
+    return list(reversed(times.all()))
+
+
+def add_user_badges(board_id: int, awards: Sequence[badges.Award]) -> int:
+    """Award badges in the current transaction; committed by the caller.
+
+    Badges the users already have are skipped. Returns the number awarded.
+    """
+    if not awards:
+        return 0
+    result = db.session.execute(
+        sqlite_insert(UserBadge.__table__).on_conflict_do_nothing(),
+        [
+            {"boardId": board_id, "userId": user_id, "badge": badge, "time": time}
+            for user_id, badge, time in awards
+        ],
+    )
+    return result.rowcount
+
+
+def get_user_badges(board_id: int, user_id: int) -> Sequence[UserBadge]:
+    return (
+        db.session.execute(
+            db.select(UserBadge)
+            .filter_by(boardId=board_id, userId=user_id)
+            .order_by(UserBadge.time, UserBadge.id)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def backfill_badges(board_id: int) -> tuple[int, int]:
+    """Rebuild the badge states of a board from its scores and award the badges earned.
+
+    The states are deleted first, so the write lock is held while the scores
+    are read. Returns the number of users and of new badges.
+    """
+    db.session.execute(db.delete(BadgeState).filter_by(boardId=board_id))
+    rows = db.session.execute(
+        db.select(ScoreLog.userId, ScoreLog.time, ScoreLog.score)
+        .filter_by(boardId=board_id)
+        .order_by(ScoreLog.time, ScoreLog.id)
+    ).all()
+    states, awards = badges.replay(board_id, rows)
+    db.session.add_all(states.values())
+    awarded = add_user_badges(board_id, awards)
+    db.session.commit()
+    return len(states), awarded
+
+
+def get_snapshot_before(
+    board_id: int, time: datetime.datetime
+) -> LeaderboardSnapshot | None:
+    return db.session.execute(
+        db.select(LeaderboardSnapshot)
+        .where(LeaderboardSnapshot.boardId == board_id, LeaderboardSnapshot.time <= time)
+        .order_by(LeaderboardSnapshot.time.desc(), LeaderboardSnapshot.id.desc())
+        .limit(1)
+    ).scalar()
+
+
+def get_snapshot_after(
+    board_id: int, time: datetime.datetime
+) -> LeaderboardSnapshot | None:
+    return db.session.execute(
+        db.select(LeaderboardSnapshot)
+        .where(LeaderboardSnapshot.boardId == board_id, LeaderboardSnapshot.time > time)
+        .order_by(LeaderboardSnapshot.time, LeaderboardSnapshot.id)
+        .limit(1)
+    ).scalar()
+
+
+def get_latest_snapshot(board_id: int) -> LeaderboardSnapshot | None:
+    return db.session.execute(
+        db.select(LeaderboardSnapshot)
+        .filter_by(boardId=board_id)
+        .order_by(LeaderboardSnapshot.time.desc(), LeaderboardSnapshot.id.desc())
+        .limit(1)
+    ).scalar()
+
+
+def add_snapshot(snapshot: LeaderboardSnapshot) -> bool:
+    """Store a snapshot, unless the board already has one at its time.
+
+    Returns whether it was stored.
+    """
+    try:
+        result = db.session.execute(
+            sqlite_insert(LeaderboardSnapshot.__table__)
+            .values(
+                boardId=snapshot.boardId,
+                time=snapshot.time,
+                lastScoreId=snapshot.lastScoreId,
+                userIds=snapshot.userIds,
+                totals=snapshot.totals,
+                ranks=snapshot.ranks,
+            )
+            .on_conflict_do_nothing()
+        )
+        db.session.commit()
+        return result.rowcount > 0
+    except exc.SQLAlchemyError:
+        db.session.rollback()
+        return False
+
+
+def get_score_deltas(
+    board_id: int,
+    after_id: int,
+    time: datetime.datetime,
+    before_id: int | None = None,
+) -> tuple[Sequence[tuple[int, int]], int]:
+    """Return per-user score sums of the scores after after_id up to time.
+
+    Scanning is bounded by before_id, the last score id of a later snapshot.
+    Also returns the highest score id included.
+    """
+    query = db.select(
+        ScoreLog.userId, db.func.sum(ScoreLog.score), db.func.max(ScoreLog.id)
+    ).where(
+        ScoreLog.boardId == board_id, ScoreLog.id > after_id, ScoreLog.time <= time
+    )
+    if before_id is not None:
+        query = query.where(ScoreLog.id <= before_id)
+    rows = db.session.execute(query.group_by(ScoreLog.userId)).all()
+    last_id = max((row[2] for row in rows), default=after_id)
+    return [(row[0], row[1]) for row in rows], last_id
+
+
+def get_first_score_time(board_id: int) -> datetime.datetime | None:
+    return db.session.execute(
+        db.select(db.func.min(ScoreLog.time)).filter_by(boardId=board_id)
+    ).scalar()
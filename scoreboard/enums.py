@@ -1,4 +1,4 @@
-from enum import IntFlag, auto, unique
+from enum import IntFlag, StrEnum, auto, unique
 
 
 @unique
@@ -6,3 +6,22 @@ class ClearanceEnum(IntFlag):
     User = auto()
     Admin = auto()
     Wannabe = auto()
+
+
+@unique
+class DataVersionEnum(StrEnum):
+    Users = auto()
+    Scores = auto()
+
+
+@unique
+class ChangeEntityEnum(StrEnum):
+    Score = auto()
+    User = auto()
+
+
+@unique
+class ChangeOperationEnum(StrEnum):
+    Insert = auto()
+    Update = auto()
+    Delete = auto()
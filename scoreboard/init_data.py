@@ -1,12 +1,19 @@
 from functools import reduce
 from itertools import combinations_with_replacement
 
+from sqlalchemy.schema import CreateIndex
 from werkzeug.security import generate_password_hash
 
-from scoreboard.enums import ClearanceEnum
+from scoreboard import database
+from scoreboard.enums import ClearanceEnum, DataVersionEnum
+from scoreboard.model.badge import BadgeState, UserBadge
+from scoreboard.model.board import DEFAULT_BOARD_ID, Board
 from scoreboard.model.user import User
 from scoreboard.model.usertype import UserType
+from scoreboard.model.change import ChangeLog
 from scoreboard.model.scores import ScoreLog
+from scoreboard.model.version import DataVersion
+from scoreboard.model.webhook import Webhook
 
 
 def init_db(app, db):
@@ -37,3 +44,114 @@ def init_db(app, db):
 
     except Exception as ex:
         print(ex)
+
+    init_boards(app, db)
+    init_indexes(app, db)
+    init_data_versions(app, db)
+    init_search_index(app, db)
+
+
+def init_boards(app, db):
+    """Create the default board, and move the scores of databases from before boards to it."""
+    with app.app_context():
+        if db.session.get(Board, DEFAULT_BOARD_ID) is None:
+            db.session.add(Board(id=DEFAULT_BOARD_ID, name="Scoreboard"))
+            db.session.commit()
+
+        columns = db.inspect(db.engine).get_columns(ScoreLog.__tablename__)
+        if any(column["name"] == "boardId" for column in columns):
+            return
+        try:
+            connection = db.session.connection()
+            connection.execute(
+                db.text(
+                    f'ALTER TABLE score_log ADD COLUMN "boardId" INTEGER NOT NULL '
+                    f"DEFAULT {DEFAULT_BOARD_ID} REFERENCES board (id)"
+                )
+            )
+            connection.execute(db.text("DROP INDEX IF EXISTS idx_userId_score"))
+            for index in ScoreLog.__table__.indexes:
+                index.create(connection, checkfirst=True)
+            db.session.commit()
+        except Exception as ex:
+            db.session.rollback()
+            app.logger.warning(f"Could not add boards to the database: {ex}")
+
+
+def init_indexes(app, db):
+    """Create the indexes added to existing tables, which create_all leaves out."""
+    with app.app_context():
+        try:
+            connection = db.session.connection()
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+            db.session.commit()
+        except Exception as ex:
+            db.session.rollback()
+            app.logger.warning(f"Could not create indexes: {ex}")
+
+
+def init_data_versions(app, db):
+    with app.app_context():
+        existing = set(db.session.execute(db.select(DataVersion.name)).scalars())
+        # Scores versions are kept per board.
+        names = [DataVersionEnum.Users.value] + [
+            database.data_version_name(DataVersionEnum.Scores, board_id)
+            for board_id in db.session.execute(db.select(Board.id)).scalars()
+        ]
+        for name in names:
+            if name not in existing:
+                db.session.add(DataVersion(name=name, version=0))
+        db.session.commit()
+
+
+# The board id is indexed too, so searches only match the board's scores
+# inside the index.
+SEARCH_INDEX_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS score_log_fts USING fts5(
+        description,
+        boardId,
+        content='score_log',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS score_log_fts_insert AFTER INSERT ON score_log BEGIN
+        INSERT INTO score_log_fts(rowid, description, boardId)
+        VALUES (new.id, new.description, new.boardId);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS score_log_fts_delete AFTER DELETE ON score_log BEGIN
+        INSERT INTO score_log_fts(score_log_fts, rowid, description, boardId)
+        VALUES ('delete', old.id, old.description, old.boardId);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS score_log_fts_update
+    AFTER UPDATE OF description, boardId ON score_log BEGIN
+        INSERT INTO score_log_fts(score_log_fts, rowid, description, boardId)
+        VALUES ('delete', old.id, old.description, old.boardId);
+        INSERT INTO score_log_fts(rowid, description, boardId)
+        VALUES (new.id, new.description, new.boardId);
+    END""",
+)
+
+
+def init_search_index(app, db):
+    """Create the FTS5 index over score descriptions, kept in sync by triggers."""
+    with app.app_context():
+        if db.engine.dialect.name != "sqlite":
+            return
+        exists = db.session.execute(
+            db.text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'score_log_fts'"
+            )
+        ).first()
+        try:
+            for statement in SEARCH_INDEX_DDL:
+                db.session.execute(db.text(statement))
+            if exists is None:
+                db.session.execute(
+                    db.text("INSERT INTO score_log_fts(score_log_fts) VALUES ('rebuild')")
+                )
+            db.session.commit()
+        except Exception as ex:
+            db.session.rollback()
+            app.logger.warning(f"Could not create search index: {ex}")
@@ -1,3 +1,5 @@
+import datetime
+
 from flask import (
     abort,
     g,
@@ -5,14 +7,42 @@ from flask import (
 
 from flask_restx import Namespace, Resource
 
-from scoreboard import database
+from sqlalchemy import exc
+
+from scoreboard import badges, changes, database, search, series, snapshots, stats
+from scoreboard.autocomplete import get_recipient_index
 from scoreboard.auth import login_required
-from scoreboard.enums import ClearanceEnum
-from scoreboard.api_models.scores import score_list_model, score_model
+from scoreboard.query_budget import query_budget
+from scoreboard.enums import ClearanceEnum, DataVersionEnum
+from scoreboard.api_models.scores import (
+    biggest_award_model,
+    rank_mover_model,
+    ranked_score_model,
+    score_giver_model,
+    score_list_model,
+    score_model,
+    score_search_hit_model,
+    score_search_model,
+    score_series_model,
+    score_stats_model,
+    series_point_model,
+)
+from scoreboard.api_models.badge import user_badge_model
+from scoreboard.api_models.board import board_model
+from scoreboard.api_models.changes import change_feed_model, change_model
 from scoreboard.api_models.common import error_response, success_response
 from scoreboard.api_models.user import public_user_model
-from scoreboard.parsers.common_parsers import id_parser
-from scoreboard.parsers.score_parsers import score_parser
+from scoreboard.parsers.common_parsers import changes_parser, id_parser
+from scoreboard.parsers.score_parsers import (
+    board_at_parser,
+    movers_parser,
+    recipient_search_parser,
+    score_parser,
+    score_search_parser,
+    series_parser,
+    top_series_parser,
+)
+from scoreboard.model.board import DEFAULT_BOARD_ID
 from scoreboard.model.scores import ScoreLog
 
 ns = Namespace("scoreboard", path="/", title="Scoreboard", description="Main endpoints for interacting with the scoreboard.", default="Scoreboard", default_label="Scoreboard")
@@ -21,43 +51,201 @@ ns.models[score_model.name] = score_model
 ns.models[error_response.name] = error_response
 ns.models[success_response.name] = success_response
 ns.models[public_user_model.name] = public_user_model
+ns.models[score_stats_model.name] = score_stats_model
+ns.models[score_giver_model.name] = score_giver_model
+ns.models[biggest_award_model.name] = biggest_award_model
+ns.models[score_series_model.name] = score_series_model
+ns.models[series_point_model.name] = series_point_model
+ns.models[ranked_score_model.name] = ranked_score_model
+ns.models[rank_mover_model.name] = rank_mover_model
+ns.models[change_model.name] = change_model
+ns.models[change_feed_model.name] = change_feed_model
+ns.models[score_search_hit_model.name] = score_search_hit_model
+ns.models[score_search_model.name] = score_search_model
+ns.models[board_model.name] = board_model
+ns.models[user_badge_model.name] = user_badge_model
+
+
+@ns.route("/boards")
+class Boards(Resource):
+
+    @query_budget(2)
+    @ns.marshal_with(board_model)
+    def get(self):
+        return database.get_boards()
 
 
-@ns.route("/scores")
+@ns.route("/scores", "/boards/<int:board_id>/scores")
 class Scores(Resource):
 
+    @query_budget(5)
+    @ns.response(404, "Not found")
     @ns.marshal_with(score_list_model)
-    def get(self):
-        return database.get_scores_aggregated()
+    def get(self, board_id: int | None = None):
+        board_id = get_board_id(board_id)
+        # Same data versions give the same body, so its compressed variants are reused.
+        g.compression_cache_key = (
+            "scores",
+            board_id,
+            database.get_data_version(DataVersionEnum.Scores, board_id),
+            database.get_data_version(DataVersionEnum.Users),
+        )
+        return database.get_scores_aggregated(board_id)
+
+
+@ns.route("/scores/stats", "/boards/<int:board_id>/scores/stats")
+class ScoresStats(Resource):
+
+    @query_budget(6)
+    @ns.response(404, "Not found")
+    @ns.marshal_with(score_stats_model)
+    def get(self, board_id: int | None = None):
+        return stats.get_leaderboard_stats(get_board_id(board_id))
+
+
+@ns.route("/scores/series", "/boards/<int:board_id>/scores/series")
+class ScoresSeries(Resource):
+    method_decorators = [login_required]
+
+    @query_budget(7)
+    @ns.expect(top_series_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(404, "Not found")
+    @ns.marshal_with(score_series_model)
+    def get(self, board_id: int | None = None):
+        board_id = get_board_id(board_id)
+        args = top_series_parser.parse_args(strict=True)
+
+        user_ids = database.get_top_user_ids(board_id, args.top)
+        names = database.get_user_names(user_ids)
+        series_by_user = series.get_series(board_id, user_ids)
+        since = to_naive_utc(args.since)
+        return [
+            {
+                "user": {"id": id, "name": names.get(id)},
+                "points": series_by_user[id].points(args.points, since),
+            }
+            for id in user_ids
+        ]
+
+
+@ns.route("/scores/at", "/boards/<int:board_id>/scores/at")
+class ScoresAt(Resource):
+
+    @query_budget(6)
+    @ns.expect(board_at_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(404, "Not found")
+    @ns.marshal_with(ranked_score_model)
+    def get(self, board_id: int | None = None):
+        board_id = get_board_id(board_id)
+        args = board_at_parser.parse_args(strict=True)
+
+        return snapshots.get_board(board_id, to_naive_utc(args.time))
+
+
+@ns.route("/scores/movers", "/boards/<int:board_id>/scores/movers")
+class ScoresMovers(Resource):
+
+    @query_budget(9)
+    @ns.expect(movers_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(404, "Not found")
+    @ns.marshal_with(rank_mover_model)
+    def get(self, board_id: int | None = None):
+        board_id = get_board_id(board_id)
+        args = movers_parser.parse_args(strict=True)
+
+        start = to_naive_utc(args.start)
+        end = to_naive_utc(args.end)
+        if start >= end:
+            abort(400, "'start' måste vara före 'end'!")
+
+        return snapshots.get_movers(board_id, start, end, args.limit)
+
+
+@ns.route("/scores/search", "/boards/<int:board_id>/scores/search")
+class ScoresSearch(Resource):
+    method_decorators = [login_required]
+
+    @query_budget(3)
+    @ns.expect(score_search_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(404, "Not found")
+    @ns.marshal_with(score_search_model)
+    def get(self, board_id: int | None = None):
+        board_id = get_board_id(board_id)
+        args = score_search_parser.parse_args(strict=True)
+
+        match = search.to_match_query(args.q)
+        if not match:
+            abort(400, "Sökningen måste innehålla minst ett ord!")
+
+        try:
+            hits = database.search_scores(
+                board_id,
+                match,
+                user_id=args.userId,
+                start=to_naive_utc(args.start),
+                end=to_naive_utc(args.end),
+                offset=args.page * args.limit,
+                limit=args.limit + 1,
+            )
+        except exc.OperationalError:
+            database.rollback()
+            abort(400, "Ogiltig sökning!")
+        return {
+            "results": [
+                {
+                    "id": score.id,
+                    "time": score.time,
+                    "user": score.user,
+                    "addedBy": score.addedBy,
+                    "score": score.score,
+                    "description": score.description,
+                    "snippet": snippet,
+                }
+                for score, snippet in hits[: args.limit]
+            ],
+            "page": args.page,
+            "has_more": len(hits) > args.limit,
+        }
 
 
-@ns.route("/score")
+@ns.route("/score", "/boards/<int:board_id>/score")
 class Score(Resource):
     method_decorators = [login_required]
 
+    @query_budget(5)
     @ns.expect(id_parser)
     @ns.response(400, "Validation error")
     @ns.response(401, "Unauthorized")
     @ns.response(404, "Not found")
     @ns.marshal_with(score_model)
-    def get(self):
+    def get(self, board_id: int | None = None):
+        board_id = get_board_id(board_id)
         args = id_parser.parse_args(strict=True)
         id = args.id
 
         score = database.get_score(id)
-        if not score:
+        if not score or score.boardId != board_id:
             abort(404, "Poäng hittades ej!")
         return score
 
+    @query_budget(13)
     @ns.expect(score_parser)
     @ns.response(400, "Validation error")
     @ns.response(401, "Unauthorized")
     @ns.response(403, "Forbidden")
     @ns.response(404, "Not found")
     @ns.marshal_with(score_model)
-    def post(self):
+    def post(self, board_id: int | None = None):
+        board_id = get_board_id(board_id)
         if (g.user.userTypeId & ClearanceEnum.Wannabe) != 0:
             score = ScoreLog(
+                boardId=board_id,
                 userId=g.user.id,
                 addedBy=g.user.id,
                 score=-100,
@@ -80,6 +268,7 @@ class Score(Resource):
             abort(403, "Kan inte ge poäng till rock!")
 
         score_log = ScoreLog(
+            boardId=board_id,
             userId=user_id,
             addedById=g.user.id,
             score=score,
@@ -90,15 +279,18 @@ class Score(Resource):
             abort(400, "Något gick fel!")
         return score_log
 
+    @query_budget(10)
     @ns.expect(id_parser)
     @ns.response(204, "Success")
     @ns.response(400, "Validation error")
     @ns.response(401, "Unauthorized")
     @ns.response(403, "Forbidden")
     @ns.response(404, "Not found")
-    def delete(self):
+    def delete(self, board_id: int | None = None):
+        board_id = get_board_id(board_id)
         if (g.user.userTypeId & ClearanceEnum.Wannabe) != 0:
             score = ScoreLog(
+                boardId=board_id,
                 userId=g.user.id,
                 addedBy=g.user.id,
                 score=-100,
@@ -112,7 +304,7 @@ class Score(Resource):
 
         score = database.get_score(id)
 
-        if not score:
+        if not score or score.boardId != board_id:
             abort(404, "Poäng hittades ej!")
 
         is_admin = g.user.userTypeId & ClearanceEnum.Admin != 0
@@ -126,11 +318,124 @@ class Score(Resource):
         return "", 204
 
 
-@ns.route("/<int:id>/scores")
+@ns.route("/score/recipients")
+class ScoreRecipients(Resource):
+    method_decorators = [login_required]
+
+    @query_budget(3)
+    @ns.expect(recipient_search_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.marshal_with(public_user_model)
+    def get(self):
+        args = recipient_search_parser.parse_args(strict=True)
+        return get_recipient_index().search(args.q, args.limit)
+
+
+@ns.route("/<int:id>/scores", "/boards/<int:board_id>/<int:id>/scores")
 class UserScore(Resource):
     method_decorators = [login_required]
 
+    @query_budget(3)
     @ns.marshal_with(score_model)
     @ns.response(401, "Unauthorized")
-    def get(self, id: int):
-        return database.get_user_scores(id)
+    @ns.response(404, "Not found")
+    def get(self, id: int, board_id: int | None = None):
+        return database.get_user_scores(get_board_id(board_id), id)
+
+
+@ns.route("/<int:id>/scores/stats", "/boards/<int:board_id>/<int:id>/scores/stats")
+class UserScoreStats(Resource):
+    method_decorators = [login_required]
+
+    @query_budget(5)
+    @ns.response(401, "Unauthorized")
+    @ns.response(404, "Not found")
+    @ns.marshal_with(score_stats_model)
+    def get(self, id: int, board_id: int | None = None):
+        board_id = get_board_id(board_id)
+        user = database.get_user(id)
+        if not user:
+            abort(404, "Användare hittades ej.")
+        return stats.get_user_stats(board_id, id, user.name)
+
+
+@ns.route(
+    "/<int:id>/scores/series", "/boards/<int:board_id>/<int:id>/scores/series"
+)
+class UserScoreSeries(Resource):
+    method_decorators = [login_required]
+
+    @query_budget(6)
+    @ns.expect(series_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.response(404, "Not found")
+    @ns.marshal_with(score_series_model)
+    def get(self, id: int, board_id: int | None = None):
+        board_id = get_board_id(board_id)
+        args = series_parser.parse_args(strict=True)
+
+        user = database.get_user(id)
+        if not user:
+            abort(404, "Användare hittades ej.")
+        user_series = series.get_series(board_id, [id])[id]
+        return {
+            "user": user,
+            "points": user_series.points(args.points, to_naive_utc(args.since)),
+        }
+
+
+@ns.route("/<int:id>/badges", "/boards/<int:board_id>/<int:id>/badges")
+class UserBadges(Resource):
+    method_decorators = [login_required]
+
+    @query_budget(4)
+    @ns.response(401, "Unauthorized")
+    @ns.response(404, "Not found")
+    @ns.marshal_with(user_badge_model)
+    def get(self, id: int, board_id: int | None = None):
+        board_id = get_board_id(board_id)
+        if not database.get_user(id):
+            abort(404, "Användare hittades ej.")
+        # Badges of rules that have been removed are left out.
+        return [
+            {
+                "badge": badge.badge,
+                "title": badges.RULES_BY_NAME[badge.badge].title,
+                "description": badges.RULES_BY_NAME[badge.badge].description,
+                "time": badge.time,
+            }
+            for badge in database.get_user_badges(board_id, id)
+            if badge.badge in badges.RULES_BY_NAME
+        ]
+
+
+@ns.route("/changes")
+class Changes(Resource):
+    method_decorators = [login_required]
+
+    @query_budget(3)
+    @ns.expect(changes_parser)
+    @ns.response(400, "Validation error")
+    @ns.response(401, "Unauthorized")
+    @ns.marshal_with(change_feed_model)
+    def get(self):
+        args = changes_parser.parse_args(strict=True)
+        return changes.get_feed(args.since, args.limit)
+
+
+def get_board_id(board_id: int | None) -> int:
+    """Return the board of a request, the default board outside /boards/<id>."""
+    if board_id is None:
+        return DEFAULT_BOARD_ID
+    if not database.get_board(board_id):
+        abort(404, "Tavlan hittades ej!")
+    return board_id
+
+
+def to_naive_utc(time: datetime.datetime | None) -> datetime.datetime | None:
+    """Scores are stored as naive UTC times."""
+    if time is None or time.tzinfo is None:
+        return time
+    return time.astimezone(datetime.UTC).replace(tzinfo=None)
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from sqlalchemy import Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from scoreboard import db
+from scoreboard.model.board import Board
+from scoreboard.model.user import User
+
+
+class BadgeState(db.Model):
+    """The running totals of a user on a board that badges are evaluated on."""
+
+    __tablename__ = "badge_state"
+
+    boardId: Mapped[int] = mapped_column(db.ForeignKey(Board.id), primary_key=True)
+    userId: Mapped[int] = mapped_column(db.ForeignKey(User.id), primary_key=True)
+    total: Mapped[int] = mapped_column(default=0)
+    # The month of the user's latest score, "YYYY-MM", and its total.
+    month: Mapped[str | None]
+    monthTotal: Mapped[int] = mapped_column(default=0)
+    # JSON list of the times of the user's latest awards, oldest first.
+    recent: Mapped[str] = mapped_column(default="[]")
+
+    __table_args__ = (
+        Index("idx_badge_state_boardId_month_total", "boardId", "month", "monthTotal"),
+        Index("idx_badge_state_userId", "userId"),
+    )
+
+
+class UserBadge(db.Model):
+    __tablename__ = "user_badge"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    boardId: Mapped[int] = mapped_column(db.ForeignKey(Board.id))
+    userId: Mapped[int] = mapped_column(db.ForeignKey(User.id))
+    # Name of the rule in scoreboard.badges.
+    badge: Mapped[str]
+    time: Mapped[datetime]
+
+    __table_args__ = (
+        UniqueConstraint("boardId", "userId", "badge", name="uq_user_badge"),
+        Index("idx_user_badge_userId", "userId"),
+    )
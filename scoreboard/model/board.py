@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from scoreboard import db
+
+# The board of scores given before there were several boards, and of the
+# endpoints outside /boards/<id>.
+DEFAULT_BOARD_ID = 1
+
+
+class Board(db.Model):
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(unique=True)
+    created: Mapped[datetime] = mapped_column(server_default=func.now())
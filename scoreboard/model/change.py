@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from scoreboard import db
+
+
+class ChangeLog(db.Model):
+    # AUTOINCREMENT keeps ids increasing after compaction, they are used as cursors.
+    id: Mapped[int] = mapped_column(primary_key=True)
+    time: Mapped[datetime] = mapped_column(server_default=func.now(), index=True)
+    entity: Mapped[str]
+    entityId: Mapped[int]
+    operation: Mapped[str]
+    payload: Mapped[str | None]
+
+    __table_args__ = {"sqlite_autoincrement": True}
+    # Load the server side time on insert, it is sent to webhooks.
+    __mapper_args__ = {"eager_defaults": True}
@@ -4,11 +4,15 @@ from sqlalchemy import Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from scoreboard import db
+from scoreboard.model.board import DEFAULT_BOARD_ID, Board
 from scoreboard.model.user import User
 
 
 class ScoreLog(db.Model):
     id: Mapped[int] = mapped_column(primary_key=True)
+    boardId: Mapped[int] = mapped_column(
+        db.ForeignKey(Board.id), default=DEFAULT_BOARD_ID
+    )
     time: Mapped[datetime] = mapped_column(server_default=func.now())
     userId: Mapped[int] = mapped_column(db.ForeignKey(User.id))
     addedById: Mapped[int] = mapped_column(db.ForeignKey(User.id))
@@ -18,4 +22,14 @@ class ScoreLog(db.Model):
     addedBy: Mapped["User"] = relationship(foreign_keys=[addedById])
     user: Mapped["User"] = relationship(foreign_keys=[userId])
 
-    __table_args__ = (Index("idx_userId_score", "userId", "score"),)
+    # Every query is for one board, so the indexes lead with it and a board
+    # is read without touching the rows of the others.
+    __table_args__ = (
+        Index("idx_boardId_userId_score", "boardId", "userId", "score"),
+        Index("idx_boardId_userId_time", "boardId", "userId", "time"),
+        Index("idx_boardId_time", "boardId", "time"),
+        Index("idx_boardId_id", "boardId", "id"),
+        Index("idx_addedById", "addedById"),
+    )
+    # Load the server side time on insert, it is written to the change log.
+    __mapper_args__ = {"eager_defaults": True}
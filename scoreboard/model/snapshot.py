@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from scoreboard import db
+from scoreboard.model.board import Board
+
+
+class LeaderboardSnapshot(db.Model):
+    id: Mapped[int] = mapped_column(primary_key=True)
+    boardId: Mapped[int] = mapped_column(db.ForeignKey(Board.id))
+    time: Mapped[datetime]
+    # Highest ScoreLog id of the board included; every score of the board
+    # with a lower id is included too.
+    lastScoreId: Mapped[int]
+    # Packed int64 arrays, ordered by rank.
+    userIds: Mapped[bytes]
+    totals: Mapped[bytes]
+    ranks: Mapped[bytes]
+
+    __table_args__ = (
+        Index("idx_snapshot_boardId_time", "boardId", "time", unique=True),
+        Index("idx_snapshot_boardId_lastScoreId", "boardId", "lastScoreId"),
+    )
@@ -1,5 +1,6 @@
 from datetime import datetime
 
+from sqlalchemy import Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from scoreboard import db
@@ -19,3 +20,10 @@ class User(db.Model):
     lastLogin: Mapped[datetime | None]
 
     userType: Mapped["UserType"] = relationship()
+
+    __table_args__ = (
+        Index("idx_user_name_id", "name", "id"),
+        Index("idx_user_lastLogin_id", "lastLogin", "id"),
+        Index("idx_user_userTypeId_id", "userTypeId", "id"),
+        Index("idx_user_email_lower", func.lower(email)),
+    )
@@ -0,0 +1,8 @@
+from sqlalchemy.orm import Mapped, mapped_column
+
+from scoreboard import db
+
+
+class DataVersion(db.Model):
+    name: Mapped[str] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(default=0)
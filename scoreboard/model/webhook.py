@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from scoreboard import db
+from scoreboard.model.board import Board
+
+
+class Webhook(db.Model):
+    id: Mapped[int] = mapped_column(primary_key=True)
+    url: Mapped[str]
+    # Deliveries are signed with it, see scoreboard.webhooks.
+    secret: Mapped[str]
+    # Only events of this board are sent, or of every board if None.
+    boardId: Mapped[int | None] = mapped_column(db.ForeignKey(Board.id))
+    created: Mapped[datetime] = mapped_column(server_default=func.now())
@@ -1,5 +1,11 @@
+from flask_restx import inputs
 from flask_restx.reqparse import RequestParser
-from scoreboard.validators.string_validators import str_length_validator
+from werkzeug.datastructures import FileStorage
+from scoreboard.validators.list_validators import int_list_validator
+from scoreboard.validators.string_validators import (
+    str_length_validator,
+    url_validator,
+)
 
 insert_user_parser = RequestParser(bundle_errors=True)
 insert_user_parser.add_argument(
@@ -11,3 +17,40 @@ insert_user_parser.add_argument(
 
 update_user_parser = insert_user_parser.copy()
 update_user_parser.add_argument("id", type=int, required=True)
+
+user_list_parser = RequestParser(bundle_errors=True)
+user_list_parser.add_argument(
+    "search", type=str_length_validator(min=1), case_sensitive=True, required=False
+)
+user_list_parser.add_argument(
+    "sort", choices=("name", "last_login", "role"), default="name", required=False
+)
+user_list_parser.add_argument("desc", type=inputs.boolean, default=False, required=False)
+user_list_parser.add_argument("cursor", type=str, required=False)
+user_list_parser.add_argument(
+    "limit", type=inputs.int_range(1, 200), default=50, required=False
+)
+
+user_ids_parser = RequestParser(bundle_errors=True)
+user_ids_parser.add_argument(
+    "ids", type=int_list_validator(), location="json", required=True
+)
+
+user_import_parser = RequestParser(bundle_errors=True)
+user_import_parser.add_argument(
+    "file", type=FileStorage, location="files", required=True
+)
+
+backup_parser = RequestParser(bundle_errors=True)
+backup_parser.add_argument(
+    "compress", type=inputs.boolean, default=False, location="json", required=False
+)
+
+board_parser = RequestParser(bundle_errors=True)
+board_parser.add_argument(
+    "name", type=str_length_validator(max=50), case_sensitive=True, required=True
+)
+
+webhook_parser = RequestParser(bundle_errors=True)
+webhook_parser.add_argument("url", type=url_validator(), case_sensitive=True, required=True)
+webhook_parser.add_argument("boardId", type=int, required=False)
@@ -1,4 +1,11 @@
+from flask_restx import inputs
 from flask_restx.reqparse import RequestParser
 
 id_parser = RequestParser(bundle_errors=True)
 id_parser.add_argument("id", type=int, required=True)
+
+changes_parser = RequestParser(bundle_errors=True)
+changes_parser.add_argument("since", type=inputs.natural, default=0, required=False)
+changes_parser.add_argument(
+    "limit", type=inputs.int_range(1, 1000), default=100, required=False
+)
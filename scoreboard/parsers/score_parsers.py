@@ -1,3 +1,4 @@
+from flask_restx import inputs
 from flask_restx.reqparse import RequestParser
 from scoreboard.validators.string_validators import str_length_validator
 
@@ -10,3 +11,44 @@ score_parser.add_argument(
     case_sensitive=True,
     required=True,
 )
+
+recipient_search_parser = RequestParser(bundle_errors=True)
+recipient_search_parser.add_argument(
+    "q", type=str_length_validator(min=1, max=50), case_sensitive=True, required=True
+)
+recipient_search_parser.add_argument(
+    "limit", type=inputs.int_range(1, 50), default=10, required=False
+)
+
+series_parser = RequestParser(bundle_errors=True)
+series_parser.add_argument(
+    "points", type=inputs.int_range(2, 1000), default=200, required=False
+)
+series_parser.add_argument("since", type=inputs.datetime_from_iso8601, required=False)
+
+top_series_parser = series_parser.copy()
+top_series_parser.add_argument(
+    "top", type=inputs.int_range(1, 20), default=5, required=False
+)
+
+board_at_parser = RequestParser(bundle_errors=True)
+board_at_parser.add_argument("time", type=inputs.datetime_from_iso8601, required=True)
+
+movers_parser = RequestParser(bundle_errors=True)
+movers_parser.add_argument("start", type=inputs.datetime_from_iso8601, required=True)
+movers_parser.add_argument("end", type=inputs.datetime_from_iso8601, required=True)
+movers_parser.add_argument(
+    "limit", type=inputs.int_range(1, 100), default=10, required=False
+)
+
+score_search_parser = RequestParser(bundle_errors=True)
+score_search_parser.add_argument(
+    "q", type=str_length_validator(min=1, max=100), case_sensitive=True, required=True
+)
+score_search_parser.add_argument("userId", type=int, required=False)
+score_search_parser.add_argument("start", type=inputs.datetime_from_iso8601, required=False)
+score_search_parser.add_argument("end", type=inputs.datetime_from_iso8601, required=False)
+score_search_parser.add_argument("page", type=inputs.natural, default=0, required=False)
+score_search_parser.add_argument(
+    "limit", type=inputs.int_range(1, 100), default=20, required=False
+)
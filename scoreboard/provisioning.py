@@ -0,0 +1,149 @@
+import csv
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Sequence
+from uuid import uuid4
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+from scoreboard import database, query_budget
+from scoreboard.enums import ClearanceEnum
+from scoreboard.model.user import User
+from scoreboard.util import email_queue
+from scoreboard.validators.string_validators import str_length_validator
+
+MAX_IMPORT_ROWS = 1000
+
+_validate_name = str_length_validator(min=1, max=50)
+_validate_email = str_length_validator(min=3)
+
+
+def invitation_email(email: str, temp_password: str, link: str) -> tuple[str, str]:
+    return (
+        "Konto för poänglista skapat!",
+        f"""Hej
+
+Det har skapats ett konto åt dig för att kunna hantera poänglistan. Inloggningsuppgifter står nedan.
+
+Länk: {link}
+Användarnamn: {email}
+Lösenord: {temp_password}
+
+Ovanstående lösenord är temporärt och vid första inloggning kommer du behöva byta ditt lösenord.
+""",
+    )
+
+
+def parse_user_csv(text: str) -> list[tuple[str, str]]:
+    """Parse name,email rows, skipping blank lines and an optional header row."""
+    rows = [row for row in csv.reader(io.StringIO(text)) if any(row)]
+    if rows and [column.strip().lower() for column in rows[0]] == ["name", "email"]:
+        rows = rows[1:]
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise ValueError(f"At most {MAX_IMPORT_ROWS} rows can be imported at once")
+    return [tuple(row) for row in rows]  # type: ignore
+
+
+def provision_users(rows: Sequence[Sequence[str]], link: str) -> list[dict]:
+    """Create users for all valid rows and queue their invitation emails.
+
+    Returns one result per row. Invalid rows and rows whose email already
+    exists are reported without affecting the rest of the batch.
+    """
+    results = [{"row": number} for number in range(1, len(rows) + 1)]
+    pending: list[tuple[dict, str, str]] = []
+    seen_emails = set()
+
+    for result, row in zip(results, rows):
+        if len(row) != 2:
+            result.update(status="invalid", message="Raden måste ha namn och email.")
+            continue
+        name, email = (column.strip() for column in row)
+        email = email.lower()
+        result.update(name=name, email=email)
+        try:
+            _validate_name(name)
+            _validate_email(email)
+            if "@" not in email:
+                raise ValueError("Invalid email")
+        except ValueError:
+            result.update(status="invalid", message="Ogiltigt namn eller email.")
+            continue
+        if email in seen_emails:
+            result.update(status="duplicate", message="Email förekommer flera gånger.")
+            continue
+        seen_emails.add(email)
+        pending.append((result, name, email))
+
+    existing = database.get_existing_emails([email for _, _, email in pending])
+    for result, _, email in pending:
+        if email in existing:
+            result.update(status="exists", message="Användare finns redan.")
+    pending = [item for item in pending if item[2] not in existing]
+
+    temp_passwords = [str(uuid4()) for _ in pending]
+    hashed_passwords = _hash_passwords(temp_passwords)
+    users = [
+        User(
+            email=email,
+            name=name,
+            password=hashed_password,
+            userTypeId=ClearanceEnum.User.value,
+        )  # type: ignore
+        for (_, name, email), hashed_password in zip(pending, hashed_passwords)
+    ]
+
+    if database.add_users(users):
+        created = [True] * len(users)
+    else:
+        # Someone else added one of the emails meanwhile, fall back to row by row.
+        users = [_copy_user(user) for user in users]
+        with query_budget.exempt():
+            created = [database.add_user(user) for user in users]
+
+    for (result, _, email), user, temp_password, ok in zip(
+        pending, users, temp_passwords, created
+    ):
+        if not ok:
+            result.update(status="failed", message="Något gick fel!")
+            continue
+        result.update(status="created", id=user.id)
+        email_queue.put(email, *invitation_email(email, temp_password, link))
+
+    return results
+
+
+def _hash_passwords(passwords: Iterable[str]) -> list[str]:
+    # scrypt releases the GIL, so threads hash in parallel.
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+        return list(executor.map(generate_password_hash, passwords))
+
+
+def _copy_user(user: User) -> User:
+    return User(
+        email=user.email,
+        name=user.name,
+        password=user.password,
+        userTypeId=user.userTypeId,
+    )  # type: ignore
+
+
+@click.command("import-users")
+@click.argument("csv_file", type=click.File(encoding="utf-8-sig"))
+@click.option("--link", default="", help="Link to the scoreboard in the invitation.")
+@with_appcontext
+def import_users_command(csv_file, link: str):
+    """Create users from a CSV file with name,email rows."""
+    try:
+        rows = parse_user_csv(csv_file.read())
+    except ValueError as ex:
+        raise click.ClickException(str(ex))
+    for result in provision_users(rows, link):
+        click.echo(
+            f"{result['row']}\t{result['status']}\t{result.get('email', '')}\t"
+            f"{result.get('message', '')}"
+        )
+    email_queue.join()
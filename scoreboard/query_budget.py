@@ -0,0 +1,70 @@
+"""Per-request SQL statement budgets, enforced in testing and development.
+
+Every resource method declares how many statements a request to it may run
+with @query_budget(n), counting the ones run before the view, like loading
+the logged in user. A request that runs more fails with QueryBudgetExceeded,
+so N+1 patterns show up as errors before they ship. Undeclared endpoints get
+SCOREBOARD_QUERY_BUDGET. In production nothing is counted.
+"""
+
+import contextlib
+import functools
+
+from flask import Flask, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from scoreboard import db
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(limit: int):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped_view(*args, **kwargs):
+            g.query_budget = limit
+            return view(*args, **kwargs)
+
+        return wrapped_view
+
+    return decorator
+
+
+@contextlib.contextmanager
+def exempt():
+    """Don't count statements of occasional maintenance work done in a request."""
+    if not has_request_context():
+        yield
+        return
+    g.query_budget_exempt = g.get("query_budget_exempt", 0) + 1
+    try:
+        yield
+    finally:
+        g.query_budget_exempt -= 1
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and not g.get("query_budget_exempt"):
+        g.query_count = g.get("query_count", 0) + 1
+
+
+def check_budget(response):
+    count = g.get("query_count", 0)
+    limit = g.get("query_budget", int(current_app.config["SCOREBOARD_QUERY_BUDGET"]))
+    response.headers["X-Query-Count"] = str(count)
+    if count > limit:
+        raise QueryBudgetExceeded(
+            f"{request.method} {request.url_rule or request.path} ran {count} "
+            f"SQL statements, its budget is {limit}"
+        )
+    return response
+
+
+def init_app(app: Flask):
+    if not app.testing and not app.config["SCOREBOARD_DEVELOPMENT"]:
+        return
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count_statement)
+    app.after_request(check_budget)
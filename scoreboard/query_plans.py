@@ -0,0 +1,530 @@
+"""EXPLAIN QUERY PLAN checks for every query in scoreboard.database.
+
+Each public function of the database module is called against a seeded
+in-memory database, the statements it runs are captured and the plan of
+every statement is checked for full scans of any table but a few small
+ones, also of scans through an index. That is what a missing index, or a
+filter an index can not serve, turns into. Statements for one board must also find its rows with an index
+leading with the board, so one board is never slowed down by the others.
+
+A function without a case in CASES fails the check too, so new queries get
+checked from the start.
+"""
+
+import dataclasses
+import datetime
+import inspect
+import random
+import re
+from typing import Callable
+
+import click
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from scoreboard import create_app, database, db
+from scoreboard.enums import (
+    ChangeEntityEnum,
+    ChangeOperationEnum,
+    ClearanceEnum,
+    DataVersionEnum,
+)
+from scoreboard.model.badge import BadgeState, UserBadge
+from scoreboard.model.board import DEFAULT_BOARD_ID, Board
+from scoreboard.model.scores import ScoreLog
+from scoreboard.model.snapshot import LeaderboardSnapshot
+from scoreboard.model.user import User
+from scoreboard.model.usertype import UserType
+from scoreboard.model.version import DataVersion
+from scoreboard.model.webhook import Webhook
+
+# Tables that only hold a few rows, which are fine to scan.
+SMALL_TABLES = (
+    Board.__tablename__,
+    DataVersion.__tablename__,
+    UserType.__tablename__,
+    Webhook.__tablename__,
+)
+BOARD_TABLES = (
+    ScoreLog.__tablename__,
+    LeaderboardSnapshot.__tablename__,
+    BadgeState.__tablename__,
+    UserBadge.__tablename__,
+)
+
+_full_scan = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: USING (?:COVERING )?INDEX \w+)?$")
+_table_access = re.compile(r"^(?:SEARCH|SCAN) (?:TABLE )?(\w+)(.*)$")
+_alias = re.compile(r'"?(\w+)"? AS "?(\w+)"?')
+
+
+@dataclasses.dataclass
+class Seed:
+    # The busy default board first, then a quieter one.
+    board_ids: list[int]
+    recipient_ids: list[int]
+    giver_ids: list[int]
+    score_ids: list[int]
+    time: datetime.datetime
+
+
+@dataclasses.dataclass
+class Case:
+    # Keyword arguments of every call to make, built from the seeded data.
+    calls: Callable[[Seed], list[dict]] = lambda seed: [{}]
+
+
+def _new_user(email: str) -> User:
+    return User(
+        email=email,
+        name=email.split("@")[0],
+        password="x",
+        userTypeId=ClearanceEnum.User.value,
+    )  # type: ignore
+
+
+def _new_score(seed: Seed) -> ScoreLog:
+    return ScoreLog(
+        boardId=seed.board_ids[0],
+        userId=seed.recipient_ids[0],
+        addedById=seed.giver_ids[0],
+        score=5,
+        description="Plan check",
+    )  # type: ignore
+
+
+def _new_snapshot(seed: Seed):
+    from scoreboard.snapshots import board_at
+
+    return board_at(seed.board_ids[0], seed.time).to_snapshot(seed.time)
+
+
+# In call order; the functions that delete come last.
+CASES: dict[str, Case] = {
+    "commit": Case(),
+    "rollback": Case(),
+    "data_version_name": Case(
+        lambda seed: [{"name": DataVersionEnum.Scores, "board_id": seed.board_ids[0]}]
+    ),
+    "get_data_version": Case(
+        lambda seed: [
+            {"name": DataVersionEnum.Users},
+            {"name": DataVersionEnum.Scores, "board_id": seed.board_ids[0]},
+        ]
+    ),
+    "bump_data_version": Case(
+        lambda seed: [{"name": DataVersionEnum.Scores, "board_id": seed.board_ids[0]}]
+    ),
+    "record_change": Case(
+        lambda seed: [
+            {
+                "entity": ChangeEntityEnum.Score,
+                "operation": ChangeOperationEnum.Delete,
+                "entity_id": seed.score_ids[0],
+            }
+        ]
+    ),
+    "get_changes": Case(lambda seed: [{"after_id": 0, "limit": 100}]),
+    "get_change_bounds": Case(),
+    "get_board": Case(lambda seed: [{"id": seed.board_ids[1]}]),
+    "get_boards": Case(),
+    "add_board": Case(lambda seed: [{"board": Board(name="New board")}]),
+    "get_webhooks": Case(),
+    "get_user": Case(lambda seed: [{"id": seed.recipient_ids[0]}]),
+    "get_users_page": Case(
+        lambda seed: [
+            {"sort": sort, "descending": descending, "search": search}
+            for sort in database.USER_SORT_COLUMNS
+            for descending in (False, True)
+            for search in (None, "rec")
+        ]
+        + [
+            {
+                "sort": sort,
+                "descending": descending,
+                "limit": limit,
+                "cursor": database.get_users_page(
+                    sort=sort, descending=descending, limit=limit
+                )[1],
+            }
+            for sort in database.USER_SORT_COLUMNS
+            for descending in (False, True)
+            # Pages within and past the users who never logged in.
+            for limit in (5, 150)
+        ]
+    ),
+    "get_user_by_email": Case(lambda seed: [{"email": "recipient0@example.com"}]),
+    "update_user_last_login": Case(lambda seed: [{"id": seed.giver_ids[0]}]),
+    "update_user_password": Case(
+        lambda seed: [{"id": seed.giver_ids[0], "hashed_password": "x"}]
+    ),
+    "get_score_recipients": Case(),
+    "add_user": Case(lambda seed: [{"user": _new_user("new@example.com")}]),
+    "get_existing_emails": Case(
+        lambda seed: [{"emails": ["Recipient0@example.com", "missing@example.com"]}]
+    ),
+    "add_users": Case(
+        lambda seed: [{"users": [_new_user(f"bulk{i}@example.com") for i in range(5)]}]
+    ),
+    "update_user": Case(
+        lambda seed: [
+            {"id": seed.giver_ids[1], "name": "Renamed", "email": "renamed@example.com"}
+        ]
+    ),
+    "reset_user_password": Case(
+        lambda seed: [{"id": seed.giver_ids[1], "hashed_temp_password": "x"}]
+    ),
+    "add_user_role": Case(
+        lambda seed: [{"id": seed.giver_ids[1], "new_role": ClearanceEnum.Admin}]
+    ),
+    "remove_user_role": Case(
+        lambda seed: [{"id": seed.giver_ids[1], "role": ClearanceEnum.Admin}]
+    ),
+    "add_users_role": Case(
+        lambda seed: [{"ids": seed.giver_ids[:3], "new_role": ClearanceEnum.Admin}]
+    ),
+    "remove_users_role": Case(
+        lambda seed: [{"ids": seed.giver_ids[:3], "role": ClearanceEnum.Admin}]
+    ),
+    "get_users_by_ids": Case(lambda seed: [{"ids": seed.recipient_ids[:10]}]),
+    "get_score": Case(lambda seed: [{"id": seed.score_ids[0]}]),
+    "add_score": Case(lambda seed: [{"score": _new_score(seed)}]),
+    "get_user_scores": Case(
+        lambda seed: [
+            {"board_id": board_id, "user_id": seed.recipient_ids[0]}
+            for board_id in seed.board_ids
+        ]
+    ),
+    "get_score_columns": Case(
+        lambda seed: [
+            {"board_id": board_id, "user_id": user_id}
+            for board_id in seed.board_ids
+            for user_id in (None, seed.recipient_ids[0])
+        ]
+    ),
+    "get_top_user_ids": Case(
+        lambda seed: [{"board_id": board_id, "limit": 10} for board_id in seed.board_ids]
+    ),
+    "get_score_summaries": Case(
+        lambda seed: [
+            {"board_id": board_id, "user_ids": seed.recipient_ids[:10]}
+            for board_id in seed.board_ids
+        ]
+    ),
+    "get_scores_after": Case(
+        lambda seed: [
+            {
+                "board_id": board_id,
+                "user_ids": seed.recipient_ids[:10],
+                "after_id": seed.score_ids[-10],
+            }
+            for board_id in seed.board_ids
+        ]
+    ),
+    "get_running_totals": Case(
+        lambda seed: [
+            {"board_id": board_id, "user_ids": seed.recipient_ids[:10]}
+            for board_id in seed.board_ids
+        ]
+    ),
+    "get_user_names": Case(lambda seed: [{"ids": seed.recipient_ids[:10]}]),
+    "search_scores": Case(
+        lambda seed: [
+            {"board_id": seed.board_ids[0], "match": '"tårta"*'},
+            {
+                "board_id": seed.board_ids[1],
+                "match": '"tårta"*',
+                "user_id": seed.recipient_ids[0],
+                "start": seed.time - datetime.timedelta(days=7),
+                "end": seed.time,
+            },
+        ]
+    ),
+    "rebuild_search_index": Case(),
+    "get_scores_aggregated": Case(
+        lambda seed: [{"board_id": board_id} for board_id in seed.board_ids]
+    ),
+    "get_snapshot_before": Case(
+        lambda seed: [{"board_id": seed.board_ids[0], "time": seed.time}]
+    ),
+    "get_snapshot_after": Case(
+        lambda seed: [{"board_id": seed.board_ids[0], "time": seed.time}]
+    ),
+    "get_latest_snapshot": Case(lambda seed: [{"board_id": seed.board_ids[0]}]),
+    "add_snapshot": Case(lambda seed: [{"snapshot": _new_snapshot(seed)}]),
+    "get_score_deltas": Case(
+        lambda seed: [
+            {
+                "board_id": seed.board_ids[0],
+                "after_id": seed.score_ids[len(seed.score_ids) // 2],
+                "time": seed.time,
+            },
+            {
+                "board_id": seed.board_ids[1],
+                "after_id": seed.score_ids[len(seed.score_ids) // 2],
+                "time": seed.time,
+                "before_id": seed.score_ids[-1],
+            },
+        ]
+    ),
+    "get_first_score_time": Case(
+        lambda seed: [{"board_id": board_id} for board_id in seed.board_ids]
+    ),
+    "get_badge_state": Case(
+        lambda seed: [
+            {"board_id": seed.board_ids[0], "user_id": seed.recipient_ids[0]}
+        ]
+    ),
+    "is_badge_month_started": Case(
+        lambda seed: [{"board_id": seed.board_ids[0], "month": f"{seed.time:%Y-%m}"}]
+    ),
+    "get_previous_month_leaders": Case(
+        lambda seed: [
+            {"board_id": seed.board_ids[0], "month": f"{seed.time:%Y-%m}", "limit": 3}
+        ]
+    ),
+    "get_recent_award_times": Case(
+        lambda seed: [
+            {
+                "board_id": seed.board_ids[0],
+                "user_id": seed.recipient_ids[0],
+                "limit": 10,
+            }
+        ]
+    ),
+    "add_user_badges": Case(
+        lambda seed: [
+            {
+                "board_id": seed.board_ids[0],
+                "awards": [(seed.recipient_ids[0], "points_1000", seed.time)],
+            }
+        ]
+    ),
+    "get_user_badges": Case(
+        lambda seed: [
+            {"board_id": seed.board_ids[0], "user_id": seed.recipient_ids[0]}
+        ]
+    ),
+    "backfill_badges": Case(lambda seed: [{"board_id": seed.board_ids[1]}]),
+    "compact_changes": Case(
+        lambda seed: [{"before": seed.time - datetime.timedelta(days=1), "max_rows": 10}]
+    ),
+    "delete_score": Case(lambda seed: [{"id": seed.score_ids[-1]}]),
+    "delete_user": Case(lambda seed: [{"id": seed.giver_ids[-1]}]),
+    # Added after every other commit, so nothing is sent to it.
+    "add_webhook": Case(
+        lambda seed: [
+            {
+                "webhook": Webhook(
+                    url="http://127.0.0.1/", secret="x", boardId=seed.board_ids[0]
+                )
+            }
+        ]
+    ),
+    "delete_webhook": Case(lambda seed: [{"id": 1}]),
+}
+
+
+def seed_database(users: int = 200, scores: int = 5000) -> Seed:
+    """Fill the database with users and a couple of months of scores on two boards."""
+    rng = random.Random(0)
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None, microsecond=0)
+    password = generate_password_hash("x")
+    recipients = [
+        User(
+            email=f"recipient{i}@example.com",
+            name=f"Recipient {i}",
+            password=password,
+            needs_password_change=False,
+            userTypeId=ClearanceEnum.User | ClearanceEnum.Wannabe,
+        )  # type: ignore
+        for i in range(users // 2)
+    ]
+    givers = [
+        User(
+            email=f"giver{i}@example.com",
+            name=f"Giver {i}",
+            password=password,
+            needs_password_change=False,
+            userTypeId=ClearanceEnum.User,
+        )  # type: ignore
+        for i in range(users - users // 2)
+    ]
+    second_board = Board(name="Second board")
+    db.session.add_all(recipients + givers + [second_board])
+    db.session.flush()
+    board_ids = [DEFAULT_BOARD_ID, second_board.id]
+
+    times = sorted(
+        now - datetime.timedelta(seconds=rng.randrange(60 * 86400)) for _ in range(scores)
+    )
+    score_logs = [
+        ScoreLog(
+            boardId=board_ids[0] if rng.random() < 0.8 else board_ids[1],
+            time=time,
+            userId=rng.choice(recipients).id,
+            addedById=rng.choice(givers).id,
+            score=rng.randint(-20, 100),
+            description=rng.choice(("Tårta", "Disk", "Städning", "Fika")) + f" {i}",
+        )  # type: ignore
+        for i, time in enumerate(times)
+    ]
+    db.session.add_all(score_logs)
+    db.session.flush()
+    seed = Seed(
+        board_ids=board_ids,
+        recipient_ids=[user.id for user in recipients],
+        giver_ids=[user.id for user in givers],
+        score_ids=[score.id for score in score_logs],
+        time=now - datetime.timedelta(days=20),
+    )
+    for id in seed.score_ids[-20:]:
+        database.record_change(ChangeEntityEnum.Score, ChangeOperationEnum.Insert, id)
+    db.session.commit()
+    for board_id in board_ids:
+        database.backfill_badges(board_id)
+
+    from scoreboard.snapshots import create_snapshot
+
+    for board_id in board_ids:
+        for days in (45, 30, 15):
+            create_snapshot(board_id, now - datetime.timedelta(days=days))
+
+    return seed
+
+
+def database_functions() -> dict[str, Callable]:
+    return {
+        name: function
+        for name, function in inspect.getmembers(database, inspect.isfunction)
+        if function.__module__ == database.__name__ and not name.startswith("_")
+    }
+
+
+def full_scans(statement: str, plan: list[str]) -> list[str]:
+    """Return the tables, apart from the small ones, that the plan scans in full."""
+    aliases = {alias: table for table, alias in _alias.findall(statement)}
+    scanned = []
+    for detail in plan:
+        match = _full_scan.match(detail)
+        if match:
+            table = aliases.get(match.group(1), match.group(1))
+            if table not in SMALL_TABLES:
+                scanned.append(table)
+    return scanned
+
+
+def cross_board_reads(statement: str, plan: list[str]) -> list[str]:
+    """Return the board tables that a statement for one board reads beyond its board."""
+    if '"boardId"' not in statement:
+        return []
+    aliases = {alias: table for table, alias in _alias.findall(statement)}
+    read = []
+    for detail in plan:
+        match = _table_access.match(detail)
+        if match:
+            table = aliases.get(match.group(1), match.group(1))
+            constraint = match.group(2)
+            if (
+                table in BOARD_TABLES
+                and "boardId=" not in constraint
+                and "rowid=" not in constraint
+            ):
+                read.append(table)
+    return read
+
+
+@dataclasses.dataclass
+class Result:
+    name: str
+    statements: int = 0
+    problems: list[str] = dataclasses.field(default_factory=list)
+
+
+def check_query_plans() -> list[Result]:
+    """Check the plans of all database functions, in the current app context."""
+    seed = seed_database()
+    functions = database_functions()
+    results = [
+        Result(name, problems=["No query plan case."])
+        for name in sorted(set(functions) - set(CASES))
+    ]
+    results += [
+        Result(name, problems=["Not a function in scoreboard.database."])
+        for name in CASES
+        if name not in functions
+    ]
+
+    captured: list[tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0]
+        captured.append((statement, tuple(parameters)))
+
+    for name, case in CASES.items():
+        if name not in functions:
+            continue
+        result = Result(name)
+        results.append(result)
+        for kwargs in case.calls(seed):
+            captured.clear()
+            event.listen(db.engine, "before_cursor_execute", capture)
+            try:
+                functions[name](**kwargs)
+            except Exception as ex:
+                result.problems.append(f"Raised {ex!r} with {kwargs}.")
+            finally:
+                event.remove(db.engine, "before_cursor_execute", capture)
+            db.session.rollback()
+
+            result.statements += len(captured)
+            connection = db.session.connection()
+            for statement, parameters in captured:
+                plan = [
+                    row[3]
+                    for row in connection.exec_driver_sql(
+                        "EXPLAIN QUERY PLAN " + statement, parameters
+                    )
+                ]
+                for table in full_scans(statement, plan):
+                    result.problems.append(
+                        f"Scans all of {table}: {' '.join(statement.split())} "
+                        f"-- plan: {'; '.join(plan)}"
+                    )
+                for table in cross_board_reads(statement, plan):
+                    result.problems.append(
+                        f"Reads {table} of other boards: {' '.join(statement.split())} "
+                        f"-- plan: {'; '.join(plan)}"
+                    )
+            db.session.rollback()
+    return results
+
+
+@click.command("check-query-plans")
+@click.option("-v", "--verbose", is_flag=True, help="List every checked function.")
+def check_query_plans_command(verbose: bool):
+    """Check that no database query scans a whole table."""
+    app = create_app(
+        {
+            "TESTING": True,
+            "SECRET_KEY": "check-query-plans",
+            "SQLALCHEMY_DATABASE_URI": "sqlite://",
+            "SCOREBOARD_ADMIN_USER_EMAIL": "admin@example.com",
+            "SCOREBOARD_ADMIN_USER_NAME": "Admin",
+            "SCOREBOARD_ADMIN_USER_PASSWORD": "check-query-plans",
+        }
+    )
+    with app.app_context():
+        results = check_query_plans()
+
+    failed = [result for result in results if result.problems]
+    for result in sorted(results, key=lambda result: result.name):
+        if result.problems:
+            click.echo(f"FAIL {result.name}")
+            for problem in result.problems:
+                click.echo(f"    {problem}")
+        elif verbose:
+            click.echo(f"ok   {result.name} ({result.statements} statements)")
+    if failed:
+        raise click.ClickException(f"{len(failed)} of {len(results)} functions failed.")
+    click.echo(f"All {len(results)} database functions passed.")
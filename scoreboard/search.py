@@ -0,0 +1,24 @@
+import re
+
+import click
+from flask.cli import with_appcontext
+
+from scoreboard import database
+
+_word = re.compile(r"\w+")
+
+
+def to_match_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching all words as prefixes.
+
+    Only word characters are kept, so user input can never be FTS5 syntax.
+    """
+    return " ".join(f'"{word}"*' for word in _word.findall(text))
+
+
+@click.command("rebuild-search-index")
+@with_appcontext
+def rebuild_search_index_command():
+    """Rebuild the full-text index over score descriptions."""
+    database.rebuild_search_index()
+    click.echo("Rebuilt search index.")
@@ -0,0 +1,177 @@
+import datetime
+from collections import defaultdict
+from typing import Sequence
+
+import numpy as np
+
+from scoreboard import database
+
+
+class CumulativeSeries:
+    """Running score total of one user, one point per score in time order."""
+
+    def __init__(self, ids: np.ndarray, times: np.ndarray, totals: np.ndarray):
+        self.ids = ids
+        self.times = times
+        self.totals = totals
+
+    @classmethod
+    def empty(cls) -> "CumulativeSeries":
+        return cls(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype="datetime64[us]"),
+            np.empty(0, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[tuple[int, int, datetime.datetime, int]]):
+        """Build from (userId, id, time, running total) rows."""
+        if not rows:
+            return cls.empty()
+        _, ids, times, totals = zip(*rows)
+        return cls(
+            np.array(ids, dtype=np.int64),
+            np.array(times, dtype="datetime64[us]"),
+            np.array(totals, dtype=np.int64),
+        )
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def total(self) -> int:
+        return int(self.totals[-1]) if self.count else 0
+
+    @property
+    def max_id(self) -> int:
+        return int(self.ids.max()) if self.count else 0
+
+    def can_extend(self, rows: Sequence[tuple[int, int, datetime.datetime, int]]):
+        """Whether (userId, id, time, score) rows all come after the last point."""
+        if not rows or not self.count:
+            return True
+        _, id, time, _ = rows[0]
+        last_time = self.times[-1]
+        first_time = np.datetime64(time, "us")
+        return first_time > last_time or (
+            first_time == last_time and id > self.ids[-1]
+        )
+
+    def extended(
+        self, rows: Sequence[tuple[int, int, datetime.datetime, int]]
+    ) -> "CumulativeSeries":
+        """Return a new series with (userId, id, time, score) rows appended."""
+        if not rows:
+            return self
+        _, ids, times, scores = zip(*rows)
+        return CumulativeSeries(
+            np.concatenate([self.ids, np.array(ids, dtype=np.int64)]),
+            np.concatenate([self.times, np.array(times, dtype="datetime64[us]")]),
+            np.concatenate(
+                [self.totals, self.total + np.cumsum(np.array(scores, dtype=np.int64))]
+            ),
+        )
+
+    def points(
+        self, max_points: int, since: datetime.datetime | None = None
+    ) -> list[dict]:
+        times, totals = self.times, self.totals
+        if since is not None:
+            start = np.searchsorted(times, np.datetime64(since, "us"))
+            times, totals = times[start:], totals[start:]
+        indices = lttb_indices(
+            times.astype(np.int64).astype(np.float64),
+            totals.astype(np.float64),
+            max_points,
+        )
+        return [
+            {"time": time, "score": int(total)}
+            for time, total in zip(times[indices].tolist(), totals[indices])
+        ]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Pick at most max_points indices with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. Every bucket in between
+    contributes the point forming the largest triangle with the previously
+    selected point and the average of the next bucket.
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1][:max_points])
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[1 + bucket] = previous
+    return selected
+
+
+# Per-worker cache of series by board and user id. Entries are replaced, never
+# mutated, so concurrent requests at worst compute the same update twice.
+_series: dict[tuple[int, int], CumulativeSeries] = {}
+
+
+def get_series(board_id: int, user_ids: Sequence[int]) -> dict[int, CumulativeSeries]:
+    """Return up to date series for the users, extending cached series with new scores.
+
+    A cached series is only extended if the user's new scores all come after
+    it and its count and total still match the database, e.g. after a
+    deletion the series is rebuilt with a windowed running sum instead.
+    """
+    summaries = database.get_score_summaries(board_id, user_ids)
+    cached = {
+        id: _series[board_id, id] for id in user_ids if (board_id, id) in _series
+    }
+    stale = [id for id in user_ids if id not in cached]
+
+    if cached:
+        after = min(series.max_id for series in cached.values())
+        new_rows = defaultdict(list)
+        for row in database.get_scores_after(board_id, list(cached), after):
+            if row[1] > cached[row[0]].max_id:
+                new_rows[row[0]].append(row)
+
+        for id, series in cached.items():
+            rows = new_rows[id]
+            count, total = summaries.get(id, (0, 0))
+            if (
+                series.count + len(rows) == count
+                and series.total + sum(row[3] for row in rows) == total
+                and series.can_extend(rows)
+            ):
+                _series[board_id, id] = series.extended(rows)
+            else:
+                stale.append(id)
+
+    if stale:
+        rows_by_user = defaultdict(list)
+        for row in database.get_running_totals(board_id, stale):
+            rows_by_user[row[0]].append(row)
+        for id in stale:
+            _series[board_id, id] = CumulativeSeries.from_rows(rows_by_user[id])
+
+    return {id: _series[board_id, id] for id in user_ids}
+
+
+def clear_cache():
+    """Forget all cached series, e.g. after the database has been restored."""
+    _series.clear()
@@ -0,0 +1,203 @@
+import datetime
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+
+from scoreboard import database
+from scoreboard.model.snapshot import LeaderboardSnapshot
+
+
+class Board:
+    """Score totals of all users ordered by rank, as parallel arrays."""
+
+    def __init__(
+        self,
+        board_id: int,
+        user_ids: np.ndarray,
+        totals: np.ndarray,
+        last_score_id: int,
+    ):
+        self.board_id = board_id
+        order = np.lexsort((user_ids, -totals))
+        self.user_ids = user_ids[order]
+        self.totals = totals[order]
+        self.last_score_id = last_score_id
+        # Competition ranking: one more than the number of strictly higher totals.
+        self.ranks = np.searchsorted(-self.totals, -self.totals, side="left") + 1
+
+    @classmethod
+    def from_snapshot(
+        cls, board_id: int, snapshot: LeaderboardSnapshot | None
+    ) -> "Board":
+        if snapshot is None:
+            return cls(board_id, np.empty(0, np.int64), np.empty(0, np.int64), 0)
+        return cls(
+            board_id,
+            np.frombuffer(snapshot.userIds, dtype=np.int64),
+            np.frombuffer(snapshot.totals, dtype=np.int64),
+            snapshot.lastScoreId,
+        )
+
+    def to_snapshot(self, time: datetime.datetime) -> LeaderboardSnapshot:
+        return LeaderboardSnapshot(
+            boardId=self.board_id,
+            time=time,
+            lastScoreId=self.last_score_id,
+            userIds=self.user_ids.astype(np.int64).tobytes(),
+            totals=self.totals.astype(np.int64).tobytes(),
+            ranks=self.ranks.astype(np.int64).tobytes(),
+        )  # type: ignore
+
+    def applied(self, deltas: list[tuple[int, int]], last_score_id: int) -> "Board":
+        """Return a new board with per-user score deltas added."""
+        if not deltas:
+            return self
+        delta_ids, delta_totals = (np.array(column, np.int64) for column in zip(*deltas))
+        user_ids, inverse = np.unique(
+            np.concatenate([self.user_ids, delta_ids]), return_inverse=True
+        )
+        totals = np.bincount(
+            inverse,
+            weights=np.concatenate([self.totals, delta_totals]),
+            minlength=len(user_ids),
+        ).astype(np.int64)
+        return Board(self.board_id, user_ids, totals, last_score_id)
+
+    def rank_of(self) -> dict[int, tuple[int, int]]:
+        return {
+            int(id): (int(rank), int(total))
+            for id, rank, total in zip(self.user_ids, self.ranks, self.totals)
+        }
+
+
+def utcnow() -> datetime.datetime:
+    # Scores are stored as naive UTC times.
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+def board_at(board_id: int, time: datetime.datetime) -> Board:
+    """Reconstruct the leaderboard of a board at a time from the nearest earlier snapshot.
+
+    Only scores between that snapshot and the next one are read, so the cost
+    is bounded by the snapshot interval rather than the length of the history.
+    """
+    snapshot = database.get_snapshot_before(board_id, time)
+    board = Board.from_snapshot(board_id, snapshot)
+    next_snapshot = database.get_snapshot_after(board_id, time)
+    deltas, last_score_id = database.get_score_deltas(
+        board_id,
+        board.last_score_id,
+        time,
+        next_snapshot.lastScoreId if next_snapshot else None,
+    )
+    return board.applied(deltas, last_score_id)
+
+
+def create_snapshot(
+    board_id: int, time: datetime.datetime | None = None
+) -> LeaderboardSnapshot:
+    time = time or utcnow()
+    snapshot = board_at(board_id, time).to_snapshot(time)
+    database.add_snapshot(snapshot)
+    return snapshot
+
+
+def backfill_snapshots(board_id: int, interval: datetime.timedelta) -> int:
+    """Create snapshots every interval from the latest snapshot, or the first score, until now.
+
+    Returns the number of snapshots stored.
+    """
+    latest = database.get_latest_snapshot(board_id)
+    start = latest.time if latest else database.get_first_score_time(board_id)
+    if start is None:
+        return 0
+    now = utcnow()
+    created = 0
+    time = start + interval
+    while time <= now:
+        if database.add_snapshot(board_at(board_id, time).to_snapshot(time)):
+            created += 1
+        time += interval
+    return created
+
+
+def get_board(board_id: int, time: datetime.datetime) -> list[dict]:
+    board = board_at(board_id, time)
+    names = database.get_user_names(board.user_ids.tolist())
+    return [
+        {
+            "user": {"id": int(id), "name": names.get(int(id))},
+            "score": int(total),
+            "rank": int(rank),
+        }
+        for id, total, rank in zip(board.user_ids, board.totals, board.ranks)
+    ]
+
+
+def get_movers(
+    board_id: int, start: datetime.datetime, end: datetime.datetime, limit: int
+) -> list[dict]:
+    """Return the users whose rank changed the most between start and end.
+
+    Users without scores at start are counted from one place below the last
+    one of the bigger board, so new users always move up.
+    """
+    start_ranks = board_at(board_id, start).rank_of()
+    end_ranks = board_at(board_id, end).rank_of()
+    unranked = max(len(start_ranks), len(end_ranks)) + 1
+
+    movers = []
+    for id, (end_rank, end_total) in end_ranks.items():
+        start_rank, start_total = start_ranks.get(id, (None, 0))
+        movers.append(
+            {
+                "user_id": id,
+                "start_rank": start_rank,
+                "end_rank": end_rank,
+                "rank_change": (start_rank or unranked) - end_rank,
+                "score_change": end_total - start_total,
+            }
+        )
+    movers.sort(key=lambda mover: (-mover["rank_change"], -mover["score_change"]))
+    movers = movers[:limit]
+
+    names = database.get_user_names([mover["user_id"] for mover in movers])
+    for mover in movers:
+        mover["user"] = {"id": mover["user_id"], "name": names.get(mover["user_id"])}
+    return movers
+
+
+@click.command("snapshot-leaderboard")
+@click.option(
+    "--backfill",
+    is_flag=True,
+    help="Create snapshots for every interval since the latest snapshot.",
+)
+@click.option(
+    "--board",
+    "board_ids",
+    type=int,
+    multiple=True,
+    help="Board to snapshot, can be repeated. All boards by default.",
+)
+@with_appcontext
+def snapshot_leaderboard_command(backfill: bool, board_ids: tuple[int, ...]):
+    """Store a snapshot of the leaderboard of every board."""
+    boards = {board.id for board in database.get_boards()}
+    unknown = set(board_ids) - boards
+    if unknown:
+        raise click.ClickException(f"No board with id {min(unknown)}.")
+    for board_id in board_ids or sorted(boards):
+        if backfill:
+            interval = datetime.timedelta(
+                seconds=int(current_app.config["SCOREBOARD_SNAPSHOT_INTERVAL"])
+            )
+            created = backfill_snapshots(board_id, interval)
+            click.echo(f"Created {created} snapshots of board {board_id}.")
+        else:
+            snapshot = create_snapshot(board_id)
+            click.echo(
+                f"Created snapshot of board {board_id} at {snapshot.time.isoformat()}."
+            )
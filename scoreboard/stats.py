@@ -0,0 +1,151 @@
+import threading
+from typing import Sequence
+
+import numpy as np
+
+from scoreboard import database
+from scoreboard.enums import DataVersionEnum
+
+
+def compute_score_stats(
+    user_ids: np.ndarray, times: np.ndarray, scores: np.ndarray, added_by: np.ndarray
+) -> list[dict]:
+    """Compute score statistics for every user in one vectorized pass.
+
+    The arrays hold one element per score and must be sorted by user and then
+    by time. Returns one dict per user, in user id order.
+    """
+    if len(user_ids) == 0:
+        return []
+
+    n = len(user_ids)
+    index = np.arange(n)
+    is_start = np.empty(n, dtype=bool)
+    is_start[0] = True
+    np.not_equal(user_ids[1:], user_ids[:-1], out=is_start[1:])
+    starts = np.flatnonzero(is_start)
+    counts = np.diff(np.append(starts, n))
+    group = np.cumsum(is_start) - 1
+
+    values = scores.astype(np.float64)
+    totals = np.add.reduceat(scores, starts)
+    means = totals / counts
+    variances = np.add.reduceat(values * values, starts) / counts - means * means
+    stds = np.sqrt(np.maximum(variances, 0))
+    minimums = np.minimum.reduceat(scores, starts)
+    maximums = np.maximum.reduceat(scores, starts)
+
+    # A streak is broken by every non-positive score and by every new user.
+    positive = scores > 0
+    breaks = np.where(~positive, index, np.where(is_start, index - 1, -1))
+    streaks = index - np.maximum.accumulate(breaks)
+    longest_streaks = np.maximum.reduceat(streaks, starts)
+
+    # The first row of each user after sorting by descending score is the biggest award.
+    biggest = np.lexsort((-scores, group))[starts]
+
+    givers, giver_inverse = np.unique(
+        np.stack([group, added_by]), axis=1, return_inverse=True
+    )
+    giver_inverse = giver_inverse.ravel()
+    giver_totals = np.bincount(giver_inverse, weights=scores).astype(np.int64)
+    giver_counts = np.bincount(giver_inverse)
+    giver_starts = np.searchsorted(givers[0], np.arange(len(starts) + 1))
+
+    stats = []
+    for i, start in enumerate(starts):
+        biggest_index = biggest[i]
+        stats.append(
+            {
+                "user_id": int(user_ids[start]),
+                "count": int(counts[i]),
+                "total": int(totals[i]),
+                "mean": float(means[i]),
+                "std": float(stds[i]),
+                "min": int(minimums[i]),
+                "max": int(maximums[i]),
+                "longest_positive_streak": int(longest_streaks[i]),
+                "biggest_award": (
+                    {
+                        "score": int(scores[biggest_index]),
+                        "time": times[biggest_index],
+                    }
+                    if positive[biggest_index]
+                    else None
+                ),
+                "givers": [
+                    {
+                        "id": int(givers[1, j]),
+                        "count": int(giver_counts[j]),
+                        "total": int(giver_totals[j]),
+                    }
+                    for j in range(giver_starts[i], giver_starts[i + 1])
+                ],
+            }
+        )
+    return stats
+
+
+def _load_stats(board_id: int, user_id: int | None = None) -> list[dict]:
+    rows = database.get_score_columns(board_id, user_id)
+    if not rows:
+        return []
+    user_ids, times, scores, added_by = zip(*rows)
+    stats = compute_score_stats(
+        np.array(user_ids, dtype=np.int64),
+        np.array(times, dtype=object),
+        np.array(scores, dtype=np.int64),
+        np.array(added_by, dtype=np.int64),
+    )
+
+    names = database.get_user_names(
+        sorted(
+            {s["user_id"] for s in stats}
+            | {giver["id"] for s in stats for giver in s["givers"]}
+        )
+    )
+    for s in stats:
+        s["user"] = {"id": s["user_id"], "name": names.get(s["user_id"])}
+        for giver in s["givers"]:
+            giver["name"] = names.get(giver["id"])
+    return stats
+
+
+def get_user_stats(board_id: int, user_id: int, user_name: str) -> dict:
+    stats = _load_stats(board_id, user_id)
+    if stats:
+        return stats[0]
+    return {
+        "user_id": user_id,
+        "user": {"id": user_id, "name": user_name},
+        "count": 0,
+        "total": 0,
+        "longest_positive_streak": 0,
+        "givers": [],
+    }
+
+
+# Stats of each board with the data versions they were computed at.
+_leaderboard_stats: dict[int, tuple[tuple[int, int], list[dict]]] = {}
+_leaderboard_locks: dict[int, threading.Lock] = {}
+
+
+def get_leaderboard_stats(board_id: int) -> Sequence[dict]:
+    """Return stats for all users of a board, recomputed only when its scores or users change."""
+    version = (
+        database.get_data_version(DataVersionEnum.Scores, board_id),
+        database.get_data_version(DataVersionEnum.Users),
+    )
+    cached = _leaderboard_stats.get(board_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    # One board's recomputation does not hold up requests for the others.
+    with _leaderboard_locks.setdefault(board_id, threading.Lock()):
+        cached = _leaderboard_stats.get(board_id)
+        if cached is None or cached[0] != version:
+            stats = sorted(
+                _load_stats(board_id), key=lambda s: s["total"], reverse=True
+            )
+            cached = _leaderboard_stats[board_id] = (version, stats)
+        return cached[1]
@@ -1,8 +1,12 @@
+import base64
+import json
+import queue
 import smtplib
+import threading
 from email.message import EmailMessage
-from typing import Sequence
+from typing import Any, Sequence
 
-from flask import current_app
+from flask import Flask, current_app
 
 
 def send_email(recipients: str | Sequence[str], subject: str, body: str):
@@ -31,3 +35,64 @@ def send_email(recipients: str | Sequence[str], subject: str, body: str):
     except smtplib.SMTPException as ex:
         current_app.logger.error(f"Failed to send email: {type(ex).__name__}: {ex}")
         raise
+
+
+class EmailQueue:
+    """Sends emails from a background thread so requests do not wait on SMTP.
+
+    The worker thread is started on first use, i.e. after a forking server has
+    forked, and runs each email in an app context of the app that queued it.
+    """
+
+    def __init__(self):
+        self._queue: queue.Queue[tuple[Flask, str | Sequence[str], str, str]] = (
+            queue.Queue()
+        )
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def put(self, recipients: str | Sequence[str], subject: str, body: str):
+        app = current_app._get_current_object()  # type: ignore
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="email-queue", daemon=True
+                )
+                self._worker.start()
+        self._queue.put((app, recipients, subject, body))
+
+    def join(self):
+        """Block until every queued email has been handled."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            app, recipients, subject, body = self._queue.get()
+            try:
+                with app.app_context():
+                    send_email(recipients, subject, body)
+            except smtplib.SMTPException:
+                pass  # Already logged by send_email
+            except Exception:
+                app.logger.exception("Unexpected error in email queue")
+            finally:
+                self._queue.task_done()
+
+
+email_queue = EmailQueue()
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps(list(values), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as ex:
+        raise ValueError("Invalid cursor") from ex
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
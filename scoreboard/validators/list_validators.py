@@ -0,0 +1,11 @@
+def int_list_validator(min=1, max=500):
+    def validate(value):
+        if not isinstance(value, list) or not all(
+            isinstance(item, int) and not isinstance(item, bool) for item in value
+        ):
+            raise ValueError("Must be a list of integers")
+        if min <= len(value) <= max:
+            return value
+        raise ValueError(f"List must have a length between {min} and {max}")
+
+    return validate
@@ -1,3 +1,6 @@
+from urllib.parse import urlsplit
+
+
 def str_length_validator(min=0, max=255):
     def validate(value):
         length = len(value)
@@ -6,3 +9,13 @@ def str_length_validator(min=0, max=255):
         raise ValueError(f"String must have a length between {min} and {max}")
 
     return validate
+
+
+def url_validator(max=2048):
+    def validate(value):
+        url = urlsplit(value)
+        if url.scheme in ("http", "https") and url.hostname and len(value) <= max:
+            return value
+        raise ValueError("Must be an http or https URL")
+
+    return validate
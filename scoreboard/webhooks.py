@@ -0,0 +1,355 @@
+"""Webhooks for score events, delivered in batches from a background thread.
+
+Score changes are collected from the change log entries flushed in a
+transaction and handed to the dispatcher when it commits, so rolled back
+changes are never sent and requests never wait on a receiver. The
+dispatcher of each worker waits briefly for more events and then posts one
+batch to every subscribed endpoint, over a kept-alive connection per host.
+A failed delivery is retried with exponential backoff, while the other
+endpoints are still served.
+
+Every request is signed with the endpoint's secret:
+
+    X-Scoreboard-Signature: sha256=<hex HMAC-SHA256 of "<timestamp>.<body>">
+
+where the timestamp is sent in X-Scoreboard-Timestamp, see verify_signature.
+A retried batch keeps its X-Scoreboard-Delivery id. Pending events are only
+kept in memory; every event has the id of its change log entry, so a
+receiver that missed some can catch up from /changes.
+"""
+
+import collections
+import dataclasses
+import hashlib
+import hmac
+import http.client
+import http.server
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+import urllib.parse
+from uuid import uuid4
+
+import click
+from flask import Flask, current_app
+from sqlalchemy import event
+
+from scoreboard import database, db
+from scoreboard.enums import ChangeEntityEnum
+from scoreboard.model.change import ChangeLog
+
+# Events kept per endpoint while it is failing, the oldest are dropped first.
+MAX_PENDING_EVENTS = 10000
+
+_SESSION_KEY = "webhook_events"
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    digest = hmac.new(
+        secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256
+    ).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(
+    secret: str, timestamp: str, body: bytes, signature: str, max_age: int = 300
+) -> bool:
+    """Check a delivery's signature, and that it was signed within max_age seconds."""
+    try:
+        age = abs(time.time() - int(timestamp))
+    except ValueError:
+        return False
+    return age <= max_age and hmac.compare_digest(sign(secret, timestamp, body), signature)
+
+
+@dataclasses.dataclass
+class Endpoint:
+    id: int
+    url: str
+    secret: str
+    board_id: int | None
+    events: collections.deque = dataclasses.field(
+        default_factory=lambda: collections.deque(maxlen=MAX_PENDING_EVENTS)
+    )
+    # The batch being delivered, sent again as is until it succeeds.
+    batch: list[dict] | None = None
+    delivery: str | None = None
+    attempts: int = 0
+    retry_at: float = 0.0
+
+    @property
+    def pending(self) -> bool:
+        return bool(self.batch or self.events)
+
+
+class WebhookDispatcher:
+    """Delivers score events to the webhooks from a background thread.
+
+    The thread is started on first use, i.e. after a forking server has
+    forked, so every worker delivers the events of its own commits.
+    """
+
+    def __init__(self):
+        self._queue: queue.Queue[tuple[Flask, list[dict]]] = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # The app of the latest events, for retries in between.
+        self._app: Flask | None = None
+        self._endpoints: dict[int, Endpoint] = {}
+        self._connections: dict[tuple[str, str, int | None], http.client.HTTPConnection] = {}
+
+    def put(self, events: list[dict]):
+        app = current_app._get_current_object()  # type: ignore
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="webhooks", daemon=True
+                )
+                self._worker.start()
+        self._queue.put((app, events))
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Block until every event has been delivered or given up on.
+
+        Returns False if that did not happen within timeout seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks or any(
+            endpoint.pending for endpoint in list(self._endpoints.values())
+        ):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _run(self):
+        while True:
+            items = []
+            try:
+                items.append(self._queue.get(timeout=self._next_retry_in()))
+            except queue.Empty:
+                pass
+            if items:
+                self._app = items[0][0]
+            app = self._app
+            try:
+                if items:
+                    items += self._wait_for_more(app)
+                    with app.app_context():
+                        self._route([event for _, events in items for event in events])
+                for endpoint in list(self._endpoints.values()):
+                    self._deliver(app, endpoint)
+            except Exception:
+                app.logger.exception("Unexpected error in webhooks")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _wait_for_more(self, app: Flask) -> list[tuple[Flask, list[dict]]]:
+        """Collect the events committed within the batch window."""
+        deadline = time.monotonic() + float(app.config["SCOREBOARD_WEBHOOK_BATCH_WINDOW"])
+        items = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return items
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                return items
+
+    def _next_retry_in(self) -> float | None:
+        pending = [e.retry_at for e in self._endpoints.values() if e.pending]
+        if not pending:
+            return None
+        return max(min(pending) - time.monotonic(), 0)
+
+    def _route(self, events: list[dict]):
+        """Add events to the endpoints subscribed to their board.
+
+        The webhooks are reloaded first, so removed ones are dropped with
+        their pending events.
+        """
+        endpoints = {}
+        for webhook in database.get_webhooks():
+            endpoint = self._endpoints.get(webhook.id)
+            if endpoint is None or (endpoint.url, endpoint.secret) != (
+                webhook.url,
+                webhook.secret,
+            ):
+                endpoint = Endpoint(webhook.id, webhook.url, webhook.secret, webhook.boardId)
+            endpoints[webhook.id] = endpoint
+        self._endpoints = endpoints
+
+        for endpoint in endpoints.values():
+            for event in events:
+                board_id = (event["data"] or {}).get("boardId")
+                if endpoint.board_id is None or endpoint.board_id == board_id:
+                    endpoint.events.append(event)
+
+    def _deliver(self, app: Flask, endpoint: Endpoint):
+        batch_size = int(app.config["SCOREBOARD_WEBHOOK_BATCH_SIZE"])
+        while endpoint.pending and endpoint.retry_at <= time.monotonic():
+            if endpoint.batch is None:
+                count = min(len(endpoint.events), batch_size)
+                endpoint.batch = [endpoint.events.popleft() for _ in range(count)]
+                endpoint.delivery = uuid4().hex
+
+            if self._post(app, endpoint):
+                endpoint.batch = None
+                endpoint.attempts = 0
+                continue
+
+            endpoint.attempts += 1
+            if endpoint.attempts > int(app.config["SCOREBOARD_WEBHOOK_RETRIES"]):
+                app.logger.error(
+                    f"Dropped {len(endpoint.batch)} webhook events for {endpoint.url} "
+                    f"after {endpoint.attempts} attempts"
+                )
+                endpoint.batch = None
+                endpoint.attempts = 0
+                continue
+
+            backoff = float(app.config["SCOREBOARD_WEBHOOK_BACKOFF"])
+            delay = backoff * 2 ** (endpoint.attempts - 1) * random.uniform(0.8, 1.2)
+            endpoint.retry_at = time.monotonic() + delay
+            return
+
+    def _post(self, app: Flask, endpoint: Endpoint) -> bool:
+        body = json.dumps({"events": endpoint.batch}).encode()
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "scoreboard-webhooks",
+            "X-Scoreboard-Delivery": endpoint.delivery,
+            "X-Scoreboard-Timestamp": timestamp,
+            "X-Scoreboard-Signature": sign(endpoint.secret, timestamp, body),
+        }
+        url = urllib.parse.urlsplit(endpoint.url)
+        path = (url.path or "/") + (f"?{url.query}" if url.query else "")
+        timeout = float(app.config["SCOREBOARD_WEBHOOK_TIMEOUT"])
+        try:
+            status = self._request(url, path, body, headers, timeout)
+        except (OSError, http.client.HTTPException) as ex:
+            app.logger.warning(f"Webhook delivery to {endpoint.url} failed: {ex!r}")
+            return False
+        if not 200 <= status < 300:
+            app.logger.warning(f"Webhook delivery to {endpoint.url} got status {status}")
+        return 200 <= status < 300
+
+    def _request(
+        self,
+        url: urllib.parse.SplitResult,
+        path: str,
+        body: bytes,
+        headers: dict,
+        timeout: float,
+    ) -> int:
+        """POST over the kept-alive connection to the host, reconnecting once if it was closed."""
+        key = (url.scheme, url.hostname or "", url.port)
+        for reused in (key in self._connections, False):
+            connection = self._connections.pop(key, None)
+            if connection is None:
+                connection_class = (
+                    http.client.HTTPSConnection
+                    if url.scheme == "https"
+                    else http.client.HTTPConnection
+                )
+                connection = connection_class(url.hostname, url.port, timeout=timeout)
+            try:
+                connection.request("POST", path, body, headers)
+                response = connection.getresponse()
+                response.read()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._connections[key] = connection
+            return response.status
+        raise AssertionError("unreachable")
+
+
+dispatcher = WebhookDispatcher()
+
+
+def collect_events(session, flush_context):
+    """Keep the score changes flushed in a transaction until it commits."""
+    for change in session.new:
+        if isinstance(change, ChangeLog) and change.entity == ChangeEntityEnum.Score:
+            session.info.setdefault(_SESSION_KEY, []).append(
+                {
+                    "id": change.id,
+                    "time": change.time.isoformat(),
+                    "entity": change.entity,
+                    "entity_id": change.entityId,
+                    "operation": change.operation,
+                    "data": json.loads(change.payload) if change.payload else None,
+                }
+            )
+
+
+def dispatch_events(session):
+    events = session.info.pop(_SESSION_KEY, None)
+    if events:
+        dispatcher.put(events)
+
+
+def discard_events(session):
+    session.info.pop(_SESSION_KEY, None)
+
+
+def init_app(app: Flask):
+    if event.contains(db.session, "after_flush", collect_events):
+        return
+    event.listen(db.session, "after_flush", collect_events)
+    event.listen(db.session, "after_commit", dispatch_events)
+    event.listen(db.session, "after_rollback", discard_events)
+
+
+@click.command("webhook-receiver")
+@click.option("--port", type=int, default=9000, help="Port to listen on.")
+@click.option("--secret", required=True, help="Secret of the webhook.")
+@click.option("--fail", type=int, default=0, help="Respond 500 to this many requests first.")
+def webhook_receiver_command(port: int, secret: str, fail: int):
+    """Run a local stand-in receiver that checks and prints webhook deliveries."""
+    failures = itertools.count()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            valid = verify_signature(
+                secret,
+                self.headers.get("X-Scoreboard-Timestamp", ""),
+                body,
+                self.headers.get("X-Scoreboard-Signature", ""),
+            )
+            status = 401 if not valid else 500 if next(failures) < fail else 204
+            events = json.loads(body)["events"] if valid else []
+            click.echo(
+                f"{status} delivery {self.headers.get('X-Scoreboard-Delivery')} "
+                f"from port {self.client_address[1]}: {len(events)} events"
+            )
+            for event in events:
+                click.echo(f"    {json.dumps(event)}")
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    click.echo(f"Receiving webhooks on http://127.0.0.1:{port}/")
+    server.serve_forever()
@@ -12,5 +12,10 @@ setup(
         "flask-restx==1.3.0",
         "gunicorn==21.2.0",
         "greenlet==3.0.3",
+        "numpy==2.1.3",
     ],
+    extras_require={
+        "brotli": ["brotli==1.1.0"],
+        "asgi": ["aiosqlite==0.20.0", "uvicorn==0.32.1"],
+    },
 )
@@ -0,0 +1,25 @@
+import pytest
+
+from scoreboard import create_app
+
+
+@pytest.fixture(scope="session")
+def config() -> dict:
+    return {
+        "TESTING": True,
+        "SECRET_KEY": "tests",
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "SCOREBOARD_ADMIN_USER_EMAIL": "admin@example.com",
+        "SCOREBOARD_ADMIN_USER_NAME": "Admin",
+        "SCOREBOARD_ADMIN_USER_PASSWORD": "tests",
+    }
+
+
+@pytest.fixture
+def app(config):
+    return create_app(config)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,45 @@
+import pytest
+
+from scoreboard import db
+from scoreboard.query_budget import QueryBudgetExceeded, exempt, query_budget
+
+
+def add_route(app, name: str, budget: int, statements: int):
+    @query_budget(budget)
+    def view():
+        for _ in range(statements):
+            db.session.execute(db.select(1))
+        return ""
+
+    app.add_url_rule(f"/{name}", name, view)
+
+
+def test_within_budget(app, client):
+    add_route(app, "within", budget=2, statements=2)
+    response = client.get("/within")
+    assert response.status_code == 200
+    assert response.headers["X-Query-Count"] == "2"
+
+
+def test_over_budget(app, client):
+    add_route(app, "over", budget=1, statements=2)
+    with pytest.raises(QueryBudgetExceeded, match="GET /over ran 2 SQL statements"):
+        client.get("/over")
+
+
+def test_exempt_statements_are_not_counted(app, client):
+    @query_budget(1)
+    def view():
+        db.session.execute(db.select(1))
+        with exempt():
+            db.session.execute(db.select(1))
+        return ""
+
+    app.add_url_rule("/exempt", "exempt", view)
+    assert client.get("/exempt").headers["X-Query-Count"] == "1"
+
+
+def test_scores_within_budget(client):
+    response = client.get("/scores")
+    assert response.status_code == 200
+    assert int(response.headers["X-Query-Count"]) > 0
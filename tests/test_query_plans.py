@@ -0,0 +1,63 @@
+import pytest
+
+from scoreboard import create_app
+from scoreboard.query_plans import check_query_plans, full_scans
+
+# The database functions behind the busiest endpoints.
+HOT_FUNCTIONS = (
+    "get_data_version",
+    "get_scores_aggregated",
+    "get_user",
+    "get_user_scores",
+    "get_top_user_ids",
+    "get_user_names",
+    "search_scores",
+    "add_score",
+)
+
+
+@pytest.fixture(scope="module")
+def results(config):
+    with create_app(config).app_context():
+        return {result.name: result for result in check_query_plans()}
+
+
+@pytest.mark.parametrize("name", HOT_FUNCTIONS)
+def test_hot_query_plan(results, name):
+    result = results[name]
+    assert result.statements > 0
+    assert result.problems == []
+
+
+def test_all_query_plans(results):
+    failed = {name: result.problems for name, result in results.items() if result.problems}
+    assert failed == {}
+
+
+@pytest.mark.parametrize(
+    "plan",
+    [
+        ["SCAN score_log"],
+        ["SCAN score_log USING INDEX idx_boardId_time"],
+        ["SCAN score_log USING COVERING INDEX idx_boardId_userId_score"],
+    ],
+)
+def test_scans_are_found(plan):
+    assert full_scans("SELECT id FROM score_log", plan) == ["score_log"]
+
+
+@pytest.mark.parametrize(
+    "plan",
+    [
+        ["SEARCH score_log USING INDEX idx_boardId_time (boardId=?)"],
+        ["SEARCH score_log USING INTEGER PRIMARY KEY (rowid=?)"],
+        ["SCAN board"],
+    ],
+)
+def test_searches_and_small_tables_pass(plan):
+    assert full_scans("SELECT id FROM score_log", plan) == []
+
+
+def test_scans_of_aliases_are_found():
+    statement = 'SELECT score_log_1.id FROM score_log AS score_log_1'
+    assert full_scans(statement, ["SCAN score_log_1"]) == ["score_log"]